@@ -0,0 +1,101 @@
+"""Seeded synthetic cargo in the CSV schemas the import endpoints accept.
+
+The same seed and count always give the same items and containers, so
+benchmark runs on different commits measure the same workload.
+"""
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+
+ZONES = [
+    "Crew Quarters", "Airlock", "Laboratory", "Medical Bay", "Storage Bay",
+    "Command Center", "Engineering Bay", "Power Bay", "External Storage", "Maintenance Bay",
+]
+
+# (name, typical side in cm, typical mass in kg, share of items with an expiry date, typical uses)
+ITEM_KINDS = [
+    ("Food Packet", 10, 0.5, 0.95, 1),
+    ("Water Bottle", 12, 1.0, 0.9, 1),
+    ("Oxygen Cylinder", 25, 12.0, 0.1, 50),
+    ("First Aid Kit", 20, 2.0, 0.6, 10),
+    ("Medical Supplies", 15, 1.0, 0.8, 5),
+    ("Tool Kit", 30, 5.0, 0.0, 200),
+    ("Spare Parts", 20, 3.0, 0.0, 20),
+    ("Science Sample", 8, 0.3, 0.4, 3),
+    ("Filter Cartridge", 18, 1.5, 0.3, 30),
+    ("Battery Pack", 15, 4.0, 0.05, 100),
+]
+
+# Items per zone container, so larger scales get more containers rather than bigger ones
+ITEMS_PER_CONTAINER = 2500
+
+# Benchmark clock: expiry dates fall within a year after this day
+START_DATE = date(2025, 1, 1)
+
+
+def generate_items(count: int, seed: int = 0) -> pl.DataFrame:
+    """Items with the columns of an item import CSV, as strings like in an uploaded file."""
+    rng = np.random.default_rng(seed)
+    kinds = rng.integers(0, len(ITEM_KINDS), count)
+    names, sides, masses, expiring, uses = (np.array(column) for column in zip(*ITEM_KINDS))
+
+    # Sizes and masses spread around each kind's typical values
+    scale = rng.lognormal(0.0, 0.25, size=(count, 3))
+    dims = np.clip(np.round(sides[kinds, None] * scale, 1), 1.0, None)
+    mass = np.round(masses[kinds] * rng.lognormal(0.0, 0.2, count), 2)
+
+    # Expiry within the next year for kinds that expire, "N/A" otherwise
+    has_expiry = rng.random(count) < expiring[kinds]
+    expiry_days = rng.integers(0, 365, count)
+    expiry = np.where(
+        has_expiry,
+        np.array([(START_DATE + timedelta(days=int(day))).isoformat() for day in range(365)])[expiry_days],
+        "N/A",
+    )
+
+    variant = rng.integers(1, 200, count)
+    zone_count = container_count(count)
+    return pl.DataFrame({
+        "itemId": [f"{i:07d}" for i in range(count)],
+        "name": [f"{names[kind]} {number}" for kind, number in zip(kinds.tolist(), variant.tolist())],
+        "width": dims[:, 0].astype(str),
+        "depth": dims[:, 1].astype(str),
+        "height": dims[:, 2].astype(str),
+        "mass": mass.astype(str),
+        "priority": rng.integers(1, 101, count).astype(str),
+        "expiryDate": expiry,
+        "usageLimit": [f"{limit} uses" for limit in np.maximum(1, rng.poisson(uses[kinds])).tolist()],
+        "preferredZone": [zone_name(zone) for zone in rng.integers(0, zone_count, count).tolist()],
+    })
+
+
+def container_count(item_count: int) -> int:
+    return max(len(ZONES), -(-item_count // ITEMS_PER_CONTAINER))
+
+
+def zone_name(number: int) -> str:
+    """The base zone names, then numbered copies of them once there are more containers."""
+    base = ZONES[number % len(ZONES)]
+    return base if number < len(ZONES) else f"{base} {number // len(ZONES) + 1}"
+
+
+def generate_containers(item_count: int, seed: int = 0) -> pl.DataFrame:
+    """One container per zone, sized to hold about ITEMS_PER_CONTAINER typical items."""
+    rng = np.random.default_rng(seed + 1)
+    count = container_count(item_count)
+    side = rng.uniform(180, 260, size=(count, 3)).round(0)
+    return pl.DataFrame({
+        "containerId": [f"cont{number:05d}" for number in range(count)],
+        "zone": [zone_name(number) for number in range(count)],
+        "width": side[:, 0].astype(str),
+        "depth": side[:, 1].astype(str),
+        "height": side[:, 2].astype(str),
+    })
+
+
+def to_csv(frame: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    frame.write_csv(buffer)
+    return buffer.getvalue()
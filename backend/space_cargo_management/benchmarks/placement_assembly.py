@@ -0,0 +1,88 @@
+"""Benchmark for building the placements frame in optimize_placement.
+
+Compares the old per-item approach (a one-row DataFrame per placement,
+hstacked with its id columns and vstacked onto the result) with
+PlacementBuilder's column buffers. Only result assembly is timed; the
+coordinates are synthetic so packing cost does not hide the difference.
+
+The per-item approach is quadratic (about 35 s for 10k rows), so unless
+--baseline-items is raised it is timed at two smaller sizes and its cost at
+--items is extrapolated with a fitted a*n + b*n^2 curve, reported as such.
+
+Run from backend/space_cargo_management:
+
+    python -m benchmarks.placement_assembly --items 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import polars as pl
+
+from placement_builder import PlacementBuilder
+
+
+def synthetic_positions(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 200, size=(count, 3))
+    ends = starts + rng.uniform(5, 30, size=(count, 3))
+    return [tuple(row) for row in np.hstack([starts, ends]).tolist()]
+
+
+def assemble_per_item(item_ids, zones, positions):
+    """The previous approach: one-row DataFrames, hstack, then vstack onto the result."""
+    placements_df = pl.DataFrame()
+    for item_id, zone, position in zip(item_ids, zones, positions):
+        placement_position = pl.DataFrame({
+            "start_x": [position[0]], "start_y": [position[1]], "start_z": [position[2]],
+            "end_x": [position[3]], "end_y": [position[4]], "end_z": [position[5]]
+        })
+        placement_record = pl.DataFrame({"itemId": [item_id], "zone": [zone]}).hstack(placement_position)
+        placements_df = placements_df.vstack(placement_record) if not placements_df.is_empty() else placement_record
+    return placements_df.rechunk()
+
+
+def assemble_with_builder(item_ids, zones, positions):
+    builder = PlacementBuilder(capacity=len(item_ids))
+    for item_id, zone, position in zip(item_ids, zones, positions):
+        builder.append(item_id, zone, position)
+    return builder.build()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000, help="Number of placements to assemble")
+    parser.add_argument("--baseline-items", type=int, default=4_000,
+                        help="Largest size at which the per-item approach is actually run")
+    args = parser.parse_args()
+
+    item_ids = [f"item-{i}" for i in range(args.items)]
+    zones = [f"zone-{i % 40}" for i in range(args.items)]
+    positions = synthetic_positions(args.items)
+
+    def timed(assemble, count):
+        started = time.perf_counter()
+        result = assemble(item_ids[:count], zones[:count], positions[:count])
+        assert result.height == count
+        return time.perf_counter() - started
+
+    builder_seconds = timed(assemble_with_builder, args.items)
+
+    if args.baseline_items >= args.items:
+        per_item_seconds, estimated = timed(assemble_per_item, args.items), False
+    else:
+        sizes = np.array([args.baseline_items // 2, args.baseline_items])
+        seconds = np.array([timed(assemble_per_item, int(size)) for size in sizes])
+        linear, quadratic = np.linalg.solve(np.column_stack([sizes, sizes ** 2]).astype(float), seconds)
+        per_item_seconds, estimated = linear * args.items + quadratic * args.items ** 2, True
+        for size, took in zip(sizes, seconds):
+            print(f"  per_item measured at {size:>7}: {took:8.3f} s")
+
+    print(f"Assembled {args.items} placements")
+    print(f"  per_item   {per_item_seconds:8.3f} s{'  (extrapolated)' if estimated else ''}")
+    print(f"  builder    {builder_seconds:8.3f} s  ({args.items / builder_seconds:,.0f} rows/s)")
+    print(f"  speedup    {per_item_seconds / builder_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark of the placement engines on single large containers.
+
+Packs the same seeded items, highest priority first, into one cubic
+container per --sides value with each engine, and reports the time per
+item, the items placed and the share of the container volume they fill.
+The voxel grid's cell count is capped, so its cells grow with the
+container and its cost per lookup stays about the same.
+
+Run from backend/space_cargo_management:
+
+    python -m benchmarks.placement_engines --items 5000 --sides 200 400
+"""
+import argparse
+import time
+
+import polars as pl
+
+from benchmarks.generator import generate_items
+from schemas import PLACEMENT_ENGINES
+
+
+def pack(engine: str, side: float, items_df: pl.DataFrame):
+    """Places every item into one side×side×side container; returns (seconds, placed, filled volume)."""
+    index = PLACEMENT_ENGINES[engine]({"width": side, "depth": side, "height": side})
+    if hasattr(index, "min_size"):
+        # As optimize_placement sets it: slivers thinner than any item side are dropped
+        index.min_size = float(items_df.select(pl.min_horizontal("width", "depth", "height").min()).item())
+    placed, volume = 0, 0.0
+    started = time.perf_counter()
+    for item_row in items_df.iter_rows(named=True):
+        if index.place_item(item_row) is not None:
+            placed += 1
+            volume += item_row["width"] * item_row["depth"] * item_row["height"]
+    return time.perf_counter() - started, placed, volume
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5_000, help="Items offered to each container")
+    parser.add_argument("--sides", type=float, nargs="+", default=[200.0, 400.0], help="Container sides in cm")
+    parser.add_argument("--engines", nargs="+", default=list(PLACEMENT_ENGINES), choices=list(PLACEMENT_ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    items_df = (
+        generate_items(args.items, args.seed)
+        .select("itemId", *[pl.col(column).cast(pl.Float64) for column in ("width", "depth", "height")],
+                pl.col("priority").cast(pl.Int64))
+        .sort("priority", descending=True, maintain_order=True)
+    )
+
+    for side in args.sides:
+        print(f"Container {side:g} cm, {args.items} items")
+        for engine in args.engines:
+            seconds, placed, volume = pack(engine, side, items_df)
+            print(f"  {engine:<14} {seconds:8.3f} s  {seconds / args.items * 1e3:7.3f} ms/item"
+                  f"  placed {placed:>6}  filled {volume / side ** 3:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""End-to-end benchmark suite over seeded synthetic cargo.
+
+For each scale (number of items) it generates the same workload from
+--seed and times the main paths of the backend: CSV import and
+validation, optimize_placement, search lookups, action log append and
+query, a year of time simulation, and arrangement export. Results are
+written as JSON; with --compare, each case is checked against an earlier
+result file and slowdowns beyond --threshold are flagged.
+
+Run from backend/space_cargo_management:
+
+    python -m benchmarks.suite --scales 1000 10000 --output bench.json
+    python -m benchmarks.suite --scales 1000 10000 --output new.json --compare bench.json
+
+Packing is the slowest case by far; --placement-limit caps the items it
+packs at large scales (the cap is recorded with the result).
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import polars as pl
+from starlette.datastructures import UploadFile
+
+from arrangement_export import csv_chunks, parquet_chunks
+from benchmarks.generator import START_DATE, generate_containers, generate_items, to_csv
+from csv_stream import iter_csv_chunks
+from log_store import ParquetLogStore
+from log_writer import ActionLogWriter
+from schemas import CargoPlacementSystem
+from simulation import SimulationEngine
+from validation import CONTAINER_CHECKS, CONTAINER_FIELDS, ITEM_CHECKS, ITEM_FIELDS, raw_frame, validate_frame
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+CASES = ["csv_import", "placement", "search", "log", "simulation", "export"]
+
+
+class Timer:
+    """Collects one result row per timed step."""
+
+    def __init__(self, scale: int):
+        self.scale = scale
+        self.results = []
+
+    def measure(self, case: str, function, operations: int = None, **details):
+        started = time.perf_counter()
+        value = function()
+        seconds = time.perf_counter() - started
+        operations = self.scale if operations is None else operations
+        self.results.append({
+            "case": case,
+            "scale": self.scale,
+            "seconds": round(seconds, 6),
+            "operations": operations,
+            "perSecond": round(operations / seconds, 1) if seconds > 0 else None,
+            **details,
+        })
+        print(f"  {case:<28} {seconds:10.4f} s  {operations / seconds if seconds else 0:14,.0f} ops/s")
+        return value
+
+
+def import_csv(data: bytes, fields, checks, chunk_size: int = 1024 * 1024) -> pl.DataFrame:
+    """The import endpoints' pipeline: stream the upload in chunks and validate each one."""
+    async def run():
+        upload = UploadFile(file=io.BytesIO(data), filename="cargo.csv")
+        frames, row_number = [], 0
+        async for header, rows in iter_csv_chunks(upload, chunk_size):
+            if rows:
+                valid_df, _ = validate_frame(raw_frame(header, rows), fields, checks, first_row=row_number + 1)
+                row_number += len(rows)
+                frames.append(valid_df)
+        return pl.concat(frames)
+    return asyncio.run(run())
+
+
+def run_scale(scale: int, args) -> list:
+    print(f"Scale {scale:,} items")
+    timer = Timer(scale)
+    rng = np.random.default_rng(args.seed)
+
+    items_csv = to_csv(generate_items(scale, args.seed))
+    containers_csv = to_csv(generate_containers(scale, args.seed))
+    containers_df = import_csv(containers_csv, CONTAINER_FIELDS, CONTAINER_CHECKS)
+
+    # CSV import and validation
+    items_df = timer.measure("csv_import", lambda: import_csv(items_csv, ITEM_FIELDS, ITEM_CHECKS),
+                             megabytes=round(len(items_csv) / 1e6, 2))
+
+    # Placement; the manifest is indexed when added, the packing itself is timed separately
+    system = CargoPlacementSystem(engine=args.engine)
+    system.add_containers(containers_df.to_dicts())
+    packed = min(scale, args.placement_limit) if args.placement_limit else scale
+    timer.measure("add_items", lambda: system.add_items(items_df))
+    if "placement" in args.cases:
+        if packed < scale:
+            system.add_items(items_df.head(packed))
+        result = timer.measure("placement", lambda: system.optimize_placement(), operations=packed,
+                               engine=args.engine, packedItems=packed)
+        placed = result["placements"][0].height
+        timer.results[-1]["placedItems"] = placed
+        if packed < scale:
+            system.add_items(items_df.slice(packed), append=True)  # The rest waits in the queue, searchable
+
+    # Search: id lookups, name prefixes, fuzzy names (the first fuzzy query builds its index)
+    if "search" in args.cases:
+        item_ids = items_df["itemId"].to_list()
+        names = items_df["name"].to_list()
+        lookups = [item_ids[i] for i in rng.integers(0, scale, 10_000).tolist()]
+        prefixes = [names[i][:6] for i in rng.integers(0, scale, 1_000).tolist()]
+        queries = [names[i].replace(" ", "")[:-1] for i in rng.integers(0, scale, 100).tolist()]
+        timer.measure("search_by_id", lambda: [system.get_item(item_id) for item_id in lookups], operations=len(lookups))
+        timer.measure("search_prefix", lambda: [system.search_index.prefix(prefix, 10) for prefix in prefixes],
+                      operations=len(prefixes))
+        timer.measure("search_fuzzy_first", lambda: system.search_index.fuzzy(queries[0], 10), operations=1)
+        timer.measure("search_fuzzy", lambda: [system.search_index.fuzzy(query, 10) for query in queries],
+                      operations=len(queries))
+
+    # Action log: one record per item over 30 days, then a one-day query filtered by user
+    if "log" in args.cases:
+        with tempfile.TemporaryDirectory() as log_dir:
+            writer = ActionLogWriter(ParquetLogStore(log_dir), flush_interval=3600, flush_size=scale + 1)
+            base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            offsets = rng.integers(0, 30 * 86400, scale).tolist()
+            records = [
+                {"timestamp": base + timedelta(seconds=offset), "userId": f"user{offset % 20}",
+                 "actionType": "retrieval", "itemId": item_id, "details": "{}"}
+                for offset, item_id in zip(offsets, items_df["itemId"].to_list())
+            ]
+
+            def append():
+                for record in records:
+                    writer.write(record)
+                writer.close()
+
+            timer.measure("log_append", append)
+            store = writer.store
+            day = base + timedelta(days=15)
+            timer.measure("log_query", lambda: store.query(day, day + timedelta(days=1), user_id="user7"), operations=1)
+
+    # A year of daily use of 1% of the items
+    if "simulation" in args.cases:
+        usage = [{"itemId": item_id} for item_id in items_df["itemId"].sample(max(1, scale // 100), seed=args.seed).to_list()]
+        start = datetime(START_DATE.year, START_DATE.month, START_DATE.day, tzinfo=timezone.utc)
+        timer.measure("simulation_365_days", lambda: SimulationEngine(system.items_df, start).advance(365, usage))
+
+    # Export of the placements, consuming every chunk
+    if "export" in args.cases and not system.placements_df.is_empty():
+        placements_df = system.placements_df
+        for name, chunks in (("export_csv", csv_chunks), ("export_parquet", parquet_chunks)):
+            timer.measure(name, lambda: sum(len(chunk) for chunk in chunks(placements_df, 65536)),
+                          operations=placements_df.height)
+
+    return timer.results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    """Prints each case against the baseline file; returns the regressed ones."""
+    with open(baseline_path) as baseline_file:
+        baseline = {(row["case"], row["scale"]): row for row in json.load(baseline_file)["results"]}
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression above {threshold:.0%} slower)")
+    for row in results:
+        before = baseline.get((row["case"], row["scale"]))
+        if before is None or not before["seconds"]:
+            continue
+        ratio = row["seconds"] / before["seconds"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ("faster" if ratio < 1 - threshold else "")
+        print(f"  {row['case']:<28} {row['scale']:>9,}  {before['seconds']:10.4f} -> {row['seconds']:10.4f} s  {ratio:6.2f}x  {flag}")
+        if flag == "REGRESSION":
+            regressions.append({"case": row["case"], "scale": row["scale"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Item counts to run")
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES, help="Cases to run (csv_import always runs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default="extreme_point", help="Placement engine")
+    parser.add_argument("--placement-limit", type=int, default=0, help="Pack at most this many items (0: all)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, args))
+
+    report = {
+        "environment": environment(),
+        "settings": {"seed": args.seed, "engine": args.engine, "placementLimit": args.placement_limit},
+        "results": results,
+    }
+    if args.compare:
+        report["regressions"] = compare(results, args.compare, args.threshold)
+
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
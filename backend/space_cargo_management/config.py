@@ -0,0 +1,50 @@
+import os
+
+# Runtime settings, overridable through environment variables
+
+# Placement index used by CargoPlacementSystem: "octree", "voxel" or "extreme_point". The extreme-point
+# packer fills containers far better but needs seconds for thousands of items in a very large container
+PLACEMENT_ENGINE = os.environ.get("CARGO_PLACEMENT_ENGINE", "octree")
+
+# Worker processes for per-zone placement; 1 packs every zone on the calling thread
+PLACEMENT_WORKERS = int(os.environ.get("CARGO_PLACEMENT_WORKERS", "1"))
+
+# Seconds a placement run may spend moving low-priority items to make room for unplaced ones
+REARRANGEMENT_TIME_BUDGET = float(os.environ.get("CARGO_REARRANGEMENT_TIME_BUDGET", "1.0"))
+
+# Placement results kept for repeated requests, bounded by count and by approximate bytes
+PLACEMENT_CACHE_ENTRIES = int(os.environ.get("CARGO_PLACEMENT_CACHE_ENTRIES", "64"))
+PLACEMENT_CACHE_BYTES = int(os.environ.get("CARGO_PLACEMENT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+# Action log: root of the date-partitioned Parquet store and background flush cadence
+LOG_DIR = os.environ.get("CARGO_LOG_DIR", "logs")
+LOG_FLUSH_INTERVAL = float(os.environ.get("CARGO_LOG_FLUSH_INTERVAL", "1.0"))
+LOG_FLUSH_SIZE = int(os.environ.get("CARGO_LOG_FLUSH_SIZE", "500"))
+
+# CSV imports are read and validated in chunks of this many bytes
+IMPORT_CHUNK_BYTES = int(os.environ.get("CARGO_IMPORT_CHUNK_BYTES", str(1024 * 1024)))
+
+# Placements per batch when streaming /api/export/arrangement
+EXPORT_BATCH_ROWS = int(os.environ.get("CARGO_EXPORT_BATCH_ROWS", "65536"))
+
+# SQLite journal (WAL mode) that keeps the state of all worker processes in step
+STATE_DB = os.environ.get("CARGO_STATE_DB", "cargo_state.db")
+
+# Arrow IPC snapshots of the state, taken every SNAPSHOT_EVERY journal entries ("0" turns them off);
+# startup maps the newest one and replays only the journal after it. The last SNAPSHOT_KEEP (at least 2) are kept
+SNAPSHOT_DIR = os.environ.get("CARGO_SNAPSHOT_DIR", "cargo_snapshots")
+SNAPSHOT_EVERY = int(os.environ.get("CARGO_SNAPSHOT_EVERY", "500"))
+SNAPSHOT_KEEP = int(os.environ.get("CARGO_SNAPSHOT_KEEP", "2"))
+
+# Seconds the return-plan optimizer may search before it settles for its best plan so far
+RETURN_PLAN_TIME_LIMIT = float(os.environ.get("CARGO_RETURN_PLAN_TIME_LIMIT", "0.5"))
+
+# Latency histograms and timing spans served at /metrics; "0" turns instrumentation off
+METRICS_ENABLED = os.environ.get("CARGO_METRICS_ENABLED", "1") != "0"
+
+# Placement jobs: "thread" packs on the job's own thread, "process" on a pool of worker processes.
+# At most JOB_WORKERS run at once and JOB_QUEUE_DEPTH more may wait; the last JOB_HISTORY finished are kept
+JOB_EXECUTOR = os.environ.get("CARGO_JOB_EXECUTOR", "thread")
+JOB_WORKERS = int(os.environ.get("CARGO_JOB_WORKERS", "1"))
+JOB_QUEUE_DEPTH = int(os.environ.get("CARGO_JOB_QUEUE_DEPTH", "8"))
+JOB_HISTORY = int(os.environ.get("CARGO_JOB_HISTORY", "100"))
@@ -0,0 +1,51 @@
+import codecs
+import csv
+import io
+from typing import AsyncIterator, List, Tuple
+
+from metrics import metrics
+
+
+def record_boundary(text: str) -> int:
+    """Offset just past the last newline that ends a complete CSV record.
+
+    A newline inside a quoted field is preceded by an odd number of quote
+    characters (escaped quotes come in pairs), so the cut moves back until
+    the quotes before it balance. Returns 0 if no record is complete yet.
+    """
+    cut = text.rfind("\n")
+    while cut >= 0 and text.count('"', 0, cut) % 2:
+        cut = text.rfind("\n", 0, cut)
+    return cut + 1
+
+
+async def iter_csv_chunks(upload, chunk_size: int) -> AsyncIterator[Tuple[List[str], List[List[str]]]]:
+    """Parses an uploaded CSV file as it is read, ``chunk_size`` bytes at a time.
+
+    Yields ``(header, rows)`` once per chunk with the complete records it
+    finished; a record cut off at the end of a chunk is carried over to the
+    next one. Blank lines are skipped. Nothing is yielded for an empty file.
+    Raises UnicodeDecodeError for input that is not UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    pending = ""
+
+    while True:
+        data = await upload.read(chunk_size)
+        final = not data
+        with metrics.span("import.parse"):
+            text = pending + decoder.decode(data, final=final)
+
+            cut = len(text) if final else record_boundary(text)
+            complete, pending = text[:cut], text[cut:]
+
+            rows = [row for row in csv.reader(io.StringIO(complete)) if any(field.strip() for field in row)]
+        if header is None and rows:
+            header = rows.pop(0)
+            yield header, rows
+        elif rows:
+            yield header, rows
+
+        if final:
+            return
@@ -0,0 +1,112 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import polars as pl
+
+# Columns that change per event; kept outside the manifest frame so an update touches one row
+MUTABLE_COLUMNS = ("usageCount", "containerId", "position")
+
+
+class ItemStore:
+    """Item manifest with the per-event columns held as mutable arrays.
+
+    The static attributes stay in an immutable Polars frame (the manifest);
+    usage counts live in a numpy array and the locations set by hand in two
+    lists, all indexed by manifest row (the search index maps itemId to
+    row). Updating one item is therefore O(1). ``frame`` joins everything
+    into one DataFrame, rebuilt only after a change.
+    """
+
+    def __init__(self):
+        self.manifest = pl.DataFrame()
+        self.usage = np.zeros(0, dtype=np.int64)
+        self.container_ids: List[Optional[str]] = []
+        self.positions: List[Optional[str]] = []  # JSON text
+        self._frame = None
+
+    @property
+    def height(self) -> int:
+        return self.manifest.height
+
+    @property
+    def columns(self) -> List[str]:
+        return self.manifest.columns + list(MUTABLE_COLUMNS)
+
+    def is_empty(self) -> bool:
+        return self.manifest.is_empty()
+
+    def reset(self, items_df: pl.DataFrame):
+        """Replaces everything with ``items_df``; mutable columns it carries are taken over."""
+        self.manifest = items_df.drop([name for name in MUTABLE_COLUMNS if name in items_df.columns])
+        self.usage, self.container_ids, self.positions = self._split(items_df)
+        self._frame = None
+
+    def append(self, items_df: pl.DataFrame):
+        """Adds rows at the end, after the existing ones."""
+        usage, container_ids, positions = self._split(items_df)
+        manifest_df = items_df.drop([name for name in MUTABLE_COLUMNS if name in items_df.columns])
+        self.manifest = pl.concat([self.manifest, manifest_df], how="diagonal_relaxed", rechunk=False)
+        self.usage = np.concatenate([self.usage, usage])
+        self.container_ids.extend(container_ids)
+        self.positions.extend(positions)
+        self._frame = None
+
+    def use(self, rows: Sequence[int], counts: Sequence[int]):
+        """Adds ``counts`` uses to ``rows``; repeated rows add up."""
+        np.add.at(self.usage, np.asarray(rows, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+        self._frame = None
+
+    def move(self, row: int, container_id: str, position: str):
+        self.container_ids[row] = container_id
+        self.positions[row] = position
+        self._frame = None
+
+    def row(self, row: int) -> dict:
+        item = self.manifest.row(row, named=True)
+        item["usageCount"] = int(self.usage[row])
+        item["containerId"] = self.container_ids[row]
+        item["position"] = self.positions[row]
+        return item
+
+    def gather(self, rows: Sequence[int]) -> pl.DataFrame:
+        """The full rows at ``rows``, in that order; costs O(len(rows))."""
+        rows = list(rows)
+        return self.manifest[rows].with_columns(
+            pl.Series("usageCount", self.usage[rows], dtype=pl.Int64),
+            pl.Series("containerId", [self.container_ids[row] for row in rows], dtype=pl.Utf8),
+            pl.Series("position", [self.positions[row] for row in rows], dtype=pl.Utf8),
+        )
+
+    def frame(self) -> pl.DataFrame:
+        """Manifest and mutable columns as one frame, rebuilt only after a change."""
+        if self._frame is None:
+            if self.manifest.is_empty() and not self.manifest.columns:
+                self._frame = pl.DataFrame()
+            else:
+                self._frame = self.manifest.with_columns(
+                    pl.Series("usageCount", self.usage, dtype=pl.Int64),
+                    pl.Series("containerId", self.container_ids, dtype=pl.Utf8),
+                    pl.Series("position", self.positions, dtype=pl.Utf8),
+                )
+        return self._frame
+
+    def copy(self) -> "ItemStore":
+        """Independent copy; the manifest frame is immutable and shared."""
+        clone = ItemStore()
+        clone.manifest = self.manifest
+        clone.usage = self.usage.copy()
+        clone.container_ids = list(self.container_ids)
+        clone.positions = list(self.positions)
+        clone._frame = self._frame
+        return clone
+
+    @staticmethod
+    def _split(items_df: pl.DataFrame):
+        height = items_df.height
+        usage = (items_df["usageCount"].cast(pl.Int64).fill_null(0).to_numpy() if "usageCount" in items_df.columns
+                 else np.zeros(height, dtype=np.int64))
+        container_ids = (items_df["containerId"].cast(pl.Utf8).to_list() if "containerId" in items_df.columns
+                         else [None] * height)
+        positions = (items_df["position"].cast(pl.Utf8).to_list() if "position" in items_df.columns
+                     else [None] * height)
+        return np.array(usage, dtype=np.int64), container_ids, positions
@@ -0,0 +1,209 @@
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+import config
+from metrics import metrics
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its cancellation was requested."""
+
+
+class JobQueueFull(Exception):
+    """The job manager already holds as many unfinished jobs as it accepts."""
+
+
+class _Progress:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class JobControl:
+    """Progress and cancellation flag of one job.
+
+    Passed to the code doing the work, which calls ``report`` now and then;
+    a cancelled job raises JobCancelled from there. In process mode both
+    values are manager proxies, so the control also works in a worker process.
+    """
+
+    def __init__(self, cancel_event, progress):
+        self._cancel_event = cancel_event
+        self._progress = progress
+
+    def report(self, done: int, total: int):
+        if total:
+            self._progress.value = min(1.0, done / total)
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def progress(self) -> float:
+        return self._progress.value
+
+
+class Job:
+    """One submitted run and what became of it."""
+
+    def __init__(self, kind: str, control: JobControl):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.control = control
+        self.status = "queued"
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": 1.0 if self.status == "succeeded" else round(float(self.control.progress), 4),
+            "submittedAt": self.submitted_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs long jobs off the event loop with a bounded backlog.
+
+    Each job runs on one of ``workers`` coordinator threads. The CPU-heavy
+    part of a job goes through ``run``: on the same thread in "thread" mode,
+    or on a pool of ``workers`` processes in "process" mode, which keeps the
+    GIL free for request handlers. At most ``workers + queue_depth`` jobs
+    are unfinished at a time; ``submit`` raises JobQueueFull beyond that.
+    The last ``history`` finished jobs are kept for polling.
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = 1, queue_depth: int = 8, history: int = 100):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown job executor '{executor}'. Choose from ['thread', 'process'].")
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.limit = self.workers + max(0, queue_depth)
+        self.history = history
+
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._unfinished = 0
+        self._lock = threading.Lock()
+        self._threads = None
+        self._processes = None
+        self._manager = None
+
+    def submit(self, kind: str, function, *args) -> Job:
+        """Queues ``function(job, *args)``; returns the job at once."""
+        with self._lock:
+            if self._unfinished >= self.limit:
+                metrics.count("jobs.rejected")
+                raise JobQueueFull(f"{self._unfinished} jobs are already queued or running.")
+            job = Job(kind, self._control())
+            self._jobs[job.id] = job
+            self._unfinished += 1
+            self._forget_finished()
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            job.future = self._threads.submit(self._run, job, function, args)
+        metrics.count("jobs.submitted")
+        return job
+
+    def run(self, job: Job, function, *args):
+        """Runs the CPU-heavy ``function(*args, job.control.report)`` of a job and returns its result."""
+        if self.executor == "thread":
+            return function(*args, job.control.report)
+        with self._lock:
+            if self._processes is None:
+                # Spawn rather than fork: forking a process that runs Polars' thread pool can deadlock
+                self._processes = ProcessPoolExecutor(max_workers=self.workers,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+        return self._processes.submit(function, *args, job.control.report).result()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a queued job at once, or asks a running one to stop at its next report."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.control.cancel()
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        return job
+
+    def close(self):
+        """Cancels unfinished jobs and stops the pools."""
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                self.cancel(job.id)
+        if self._threads is not None:
+            self._threads.shutdown(wait=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown()
+            self._processes = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def _run(self, job: Job, function, args):
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        try:
+            if job.control.cancelled:
+                raise JobCancelled()
+            job.result = function(job, *args)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+            raise
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, "failed")
+            raise  # Also seen by whoever awaits job.future
+        self._finish(job, "succeeded")
+        return job.result
+
+    def _finish(self, job: Job, status: str):
+        with self._lock:
+            job.status = status
+            job.finished_at = datetime.now(timezone.utc)
+            self._unfinished -= 1
+        metrics.count(f"jobs.{status}")
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _control(self) -> JobControl:
+        if self.executor == "thread":
+            return JobControl(threading.Event(), _Progress())
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return JobControl(self._manager.Event(), self._manager.Value("d", 0.0))
+
+
+# Shared by the placement and export routes of this process
+job_manager = JobManager(config.JOB_EXECUTOR, config.JOB_WORKERS, config.JOB_QUEUE_DEPTH, config.JOB_HISTORY)
@@ -0,0 +1,139 @@
+import glob
+import os
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import polars as pl
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is then only serialized within one process
+    fcntl = None
+
+from metrics import metrics
+
+# Typed schema of the action log; low-cardinality columns are categorical
+LOG_SCHEMA = {
+    "timestamp": pl.Datetime("us", "UTC"),
+    "userId": pl.Categorical,
+    "actionType": pl.Categorical,
+    "itemId": pl.Utf8,
+    "details": pl.Utf8,  # JSON string
+}
+
+
+class ParquetLogStore:
+    """Action log stored as date-partitioned Parquet files.
+
+    Every flushed batch becomes an immutable part file under
+    ``<root>/date=YYYY-MM-DD/``, so writes never rewrite history. Queries
+    only list the partitions inside the requested date range and scan them
+    lazily, so filters on time, item, user and action type are pushed down
+    into the Parquet reader. ``compact`` merges the parts of past days.
+
+    Every worker process compacts, so each partition has a lock file:
+    compaction holds it exclusively while it swaps parts, queries hold it
+    shared while they read, and never see parts vanish or rows twice.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._compact_lock = threading.Lock()
+
+    def write_batch(self, records: List[dict]):
+        """Appends records as one new part file per day they fall on."""
+        with metrics.span("log.write_batch"):
+            batch_df = pl.DataFrame(records, schema=LOG_SCHEMA)
+            for day_df in self._split_by_day(batch_df):
+                day = day_df["timestamp"][0].date()
+                directory = self._partition(day)
+                os.makedirs(directory, exist_ok=True)
+
+                # Write under a temporary name first so readers never see a partial file
+                name = f"part-{datetime.now(timezone.utc):%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+                temporary = os.path.join(directory, f".{name}.tmp")
+                day_df.write_parquet(temporary, statistics=True)
+                os.replace(temporary, os.path.join(directory, name))
+        metrics.count("log.records_written", len(records))
+
+    def query(self, start: datetime, end: datetime, item_id: Optional[str] = None,
+              user_id: Optional[str] = None, action_type: Optional[str] = None) -> pl.DataFrame:
+        """Returns log records in [start, end] matching the optional filters, oldest first."""
+        predicate = (pl.col("timestamp") >= start) & (pl.col("timestamp") <= end)
+        if item_id:
+            predicate &= pl.col("itemId") == item_id
+        if user_id:
+            predicate &= pl.col("userId") == user_id
+        if action_type:
+            predicate &= pl.col("actionType") == action_type
+
+        with metrics.span("log.query"):
+            for attempt in range(3):
+                with ExitStack() as locks:
+                    paths = []
+                    for directory in self.partitions(start.date(), end.date()):
+                        locks.enter_context(_partition_lock(directory, exclusive=False))
+                        paths.extend(sorted(glob.glob(os.path.join(directory, "*.parquet"))))
+                    if not paths:
+                        return pl.DataFrame(schema=LOG_SCHEMA)
+                    try:
+                        return pl.scan_parquet(paths).filter(predicate).sort("timestamp").collect()
+                    except FileNotFoundError:
+                        # Only without fcntl can compaction remove a part between listing and reading
+                        if attempt == 2:
+                            raise
+
+    def partitions(self, first_day: date, last_day: date) -> List[str]:
+        """Partition directories for days between first_day and last_day inclusive."""
+        directories = []
+        for directory in glob.glob(os.path.join(self.root, "date=*")):
+            try:
+                day = date.fromisoformat(os.path.basename(directory)[len("date="):])
+            except ValueError:
+                continue
+            if first_day <= day <= last_day:
+                directories.append(directory)
+        return sorted(directories)
+
+    def compact(self, before: Optional[date] = None):
+        """Merges the part files of every day before ``before`` (today by default) into one."""
+        before = before or datetime.now(timezone.utc).date()
+        with self._compact_lock, metrics.span("log.compact"):
+            for directory in self.partitions(date.min, before):
+                if os.path.basename(directory) == f"date={before.isoformat()}":
+                    continue
+                with _partition_lock(directory, exclusive=True):
+                    # Listed under the lock: parts another process already merged are gone by now
+                    parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+                    if len(parts) < 2:
+                        continue
+
+                    merged = os.path.join(directory, f"part-compacted-{uuid.uuid4().hex[:8]}.parquet")
+                    temporary = os.path.join(directory, f".{os.path.basename(merged)}.tmp")
+                    pl.read_parquet(parts).sort("timestamp").write_parquet(temporary, statistics=True)
+                    os.replace(temporary, merged)
+                    for part in parts:
+                        try:
+                            os.remove(part)
+                        except FileNotFoundError:
+                            pass
+
+    def _partition(self, day: date) -> str:
+        return os.path.join(self.root, f"date={day.isoformat()}")
+
+    @staticmethod
+    def _split_by_day(batch_df: pl.DataFrame) -> List[pl.DataFrame]:
+        return batch_df.with_columns(pl.col("timestamp").dt.date().alias("_date")) \
+            .partition_by("_date", include_key=False, maintain_order=True)
+
+
+@contextmanager
+def _partition_lock(directory: str, exclusive: bool):
+    """Cross-process lock on one day partition; released when the lock file is closed."""
+    with open(os.path.join(directory, ".compact.lock"), "a") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
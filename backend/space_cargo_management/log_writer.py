@@ -0,0 +1,92 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import config
+from log_store import ParquetLogStore
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ActionLogWriter:
+    """Buffered, append-only front end for the action log.
+
+    ``write`` only queues the record, so request handlers never wait on
+    disk. A background thread hands queued records to the store every
+    ``flush_interval`` seconds, or sooner once ``flush_size`` records are
+    waiting, and compacts finished days once the date rolls over.
+    """
+
+    def __init__(self, store: ParquetLogStore, flush_interval: float = 1.0, flush_size: int = 500):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+        self._compacted_through = None
+
+    def write(self, record: dict):
+        """Queues one record; never touches the store."""
+        self._queue.append(record)
+        if self._thread is None:
+            self._start()
+        if len(self._queue) >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Writes every queued record to the store now."""
+        with self._write_lock:
+            batch = []
+            while self._queue:
+                batch.append(self._queue.popleft())
+            if batch:
+                self.store.write_batch(batch)
+
+    def close(self):
+        """Stops the background thread and writes out anything still queued."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _start(self):
+        with self._write_lock:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="action-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()  # A batch that fails is dropped, never retried
+            except Exception:
+                metrics.count("log.flush_errors")
+                logger.exception("Action log flush failed; the batch was dropped")
+            today = datetime.now(timezone.utc).date()
+            if self._compacted_through != today:
+                self._compacted_through = today  # Tried once per day, even if it fails
+                try:
+                    self.store.compact(before=today)  # Merge the part files of finished days
+                except Exception:
+                    metrics.count("log.compact_errors")
+                    logger.exception("Action log compaction failed")
+
+
+# Shared sink used by log_action and queried by /api/logs
+action_log = ActionLogWriter(
+    ParquetLogStore(config.LOG_DIR),
+    flush_interval=config.LOG_FLUSH_INTERVAL,
+    flush_size=config.LOG_FLUSH_SIZE,
+)
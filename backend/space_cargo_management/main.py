@@ -1,12 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from jobs import job_manager
+from log_writer import action_log
+from metrics import MetricsMiddleware, metrics
+from state import shared_state
 from routers import import_export, placement, search_retrieve, waste, time_simulation, logs
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop placement jobs, write out buffered log records, stop placement workers
+    # and close the state journal on shutdown
+    job_manager.close()
+    action_log.close()
+    shared_state.close()
+
+
 app = FastAPI(
     title="Cargo Management API",
     description="API for managing cargo placement, retrieval, waste, and time simulation.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-route latency and body sizes; left out entirely when metrics are off
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(import_export.router)
 app.include_router(logs.router)
 app.include_router(placement.router)
@@ -18,4 +40,10 @@ app.include_router(time_simulation.router)
 # Root endpoint
 @app.get("/")
 async def root():
-    return {"message": "Cargo Management API is running!"}
\ No newline at end of file
+    return {"message": "Cargo Management API is running!"}
+
+
+# Prometheus scrape endpoint: request histograms, timing spans and event counters of this process
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
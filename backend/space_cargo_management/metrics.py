@@ -0,0 +1,222 @@
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Sequence, Tuple
+
+import config
+
+# Histogram bucket upper bounds: seconds for latencies and spans, bytes for sizes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+# Returned by span() when instrumentation is off, so a disabled span is one attribute check
+_DISABLED_SPAN = nullcontext()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labels, labels)} {value:g}"
+
+
+class Histogram:
+    """Counts of observations per bucket, with their sum, per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # labels -> [count per bucket (last: above all), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        bucket = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                bucket = position
+                break
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = _labels(self.labels, labels, 'le="%g"' % bound)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            cumulative += counts[-1]
+            bucket_labels = _labels(self.labels, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text format.
+
+    With ``enabled`` false nothing is recorded: ``span`` hands back a shared
+    no-op context manager and ``count``/``observe_span`` return at once.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.spans = self.histogram("cargo_span_seconds", "Time spent in named steps of the backend.", ["span"])
+        self.events = self.counter("cargo_events_total", "Counts of notable events.", ["event"])
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def span(self, name: str):
+        """Context manager timing the enclosed block under ``name``."""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return _Span(self.spans, name)
+
+    def observe_span(self, name: str, seconds: float):
+        """Records a step timed elsewhere, e.g. in a worker process."""
+        if self.enabled:
+            self.spans.observe(seconds, name)
+
+    def count(self, event: str, amount: float = 1.0):
+        if self.enabled and amount:
+            self.events.inc(amount, event)
+
+    def render(self) -> str:
+        with self._lock:
+            registered = list(self._metrics.values())
+        lines = []
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        """Adds ``metric``, or returns the one already registered under its name."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind:
+                    raise ValueError(f"Metric '{metric.name}' is already registered as a {existing.kind}.")
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+
+class _Span:
+    __slots__ = ("histogram", "name", "started")
+
+    def __init__(self, histogram: Histogram, name: str):
+        self.histogram = histogram
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.name)
+        return False
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and body sizes per route.
+
+    Routes are labelled by their path template (``/api/logs``, not the
+    query string or path parameters) so the label set stays small;
+    requests no route matched share the label "unmatched". Latency runs
+    until the last body chunk is sent, so streamed responses count in full.
+    """
+
+    def __init__(self, app, registry: "MetricsRegistry" = None):
+        self.app = app
+        registry = registry or metrics
+        self.latency = registry.histogram(
+            "cargo_http_request_duration_seconds", "HTTP request latency.", ["method", "route", "status"]
+        )
+        self.request_size = registry.histogram(
+            "cargo_http_request_size_bytes", "HTTP request body size.", ["method", "route"], SIZE_BUCKETS
+        )
+        self.response_size = registry.histogram(
+            "cargo_http_response_size_bytes", "HTTP response body size.", ["method", "route"], SIZE_BUCKETS
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        sizes = [0, 0]  # request, response bytes
+        status = [500]
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            # The router leaves the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            self.latency.observe(time.perf_counter() - started, method, route, str(status[0]))
+            self.request_size.observe(sizes[0], method, route)
+            self.response_size.observe(sizes[1], method, route)
+
+
+# Shared by every module of this process
+metrics = MetricsRegistry(enabled=config.METRICS_ENABLED)
@@ -0,0 +1,98 @@
+from typing import Dict, List
+
+import numpy as np
+import polars as pl
+
+from placement_builder import COORDINATE_COLUMNS
+
+EPS = 1e-9
+
+# Upper bound on target × item pairs compared at once by blocker_counts
+MAX_PAIRS = 4_000_000
+
+
+class OcclusionIndex:
+    """Which placed items stand between an item and the open face of its container.
+
+    Items are taken out along the depth axis through the face at y = 0. An
+    item blocks a target when it lies entirely in front of it (its end_y is
+    at most the target's start_y) and their footprints on the x/z plane
+    overlap. Per zone, boxes are kept sorted by end_y, so the items in front
+    of any depth are a prefix of the array found with one binary search.
+    """
+
+    def __init__(self, placements_df: pl.DataFrame):
+        self.zones: Dict[str, tuple] = {}
+        self.locations: Dict[str, tuple] = {}  # itemId -> (zone, row in that zone's arrays)
+
+        if placements_df.is_empty():
+            return
+        for zone_df in placements_df.sort("end_y").partition_by("zone", maintain_order=True):
+            zone = zone_df["zone"][0]
+            item_ids = zone_df["itemId"].cast(pl.Utf8).to_list()
+            boxes = zone_df.select(COORDINATE_COLUMNS).to_numpy()
+            self.zones[zone] = (item_ids, boxes)
+            self.locations.update((item_id, (zone, row)) for row, item_id in enumerate(item_ids))
+
+    def blockers(self, item_id) -> List[str]:
+        """ItemIds that must come out before ``item_id``, in removal order.
+
+        This is the smallest such set: the items in front of the target, plus
+        whatever is in front of those, removed front-most (then top-most) first.
+        """
+        location = self.locations.get(str(item_id))
+        if location is None:
+            return []
+        zone, row = location
+        item_ids, boxes = self.zones[zone]
+
+        blocked = np.zeros(len(boxes), dtype=bool)
+        frontier = [row]
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                in_front = int(np.searchsorted(boxes[:, 4], boxes[current, 1] + EPS, side="right"))
+                hits = np.flatnonzero(_footprints_overlap(boxes[:in_front], boxes[current]) & ~blocked[:in_front])
+                blocked[hits] = True
+                next_frontier.extend(hits.tolist())
+            frontier = next_frontier
+
+        rows = np.flatnonzero(blocked)
+        order = np.lexsort((-boxes[rows, 2], boxes[rows, 1]))  # Front-most first, then top-most
+        return [item_ids[r] for r in rows[order]]
+
+    def blocker_counts(self, item_ids: List) -> List[int]:
+        """Number of items directly in front of each item (0 for unplaced ones), computed in bulk."""
+        counts = np.zeros(len(item_ids), dtype=np.int64)
+
+        by_zone: Dict[str, list] = {}
+        for position, item_id in enumerate(item_ids):
+            location = self.locations.get(str(item_id))
+            if location is not None:
+                by_zone.setdefault(location[0], []).append((position, location[1]))
+
+        for zone, targets in by_zone.items():
+            boxes = self.zones[zone][1]
+            positions = np.array([position for position, _ in targets])
+            rows = np.array([row for _, row in targets])
+
+            # Compare chunks of targets against every box of the zone at once
+            chunk = max(1, MAX_PAIRS // len(boxes))
+            for begin in range(0, len(rows), chunk):
+                target_boxes = boxes[rows[begin:begin + chunk]]
+                in_front = boxes[None, :, 4] <= target_boxes[:, 1, None] + EPS
+                in_front &= boxes[None, :, 0] < target_boxes[:, 3, None] - EPS
+                in_front &= target_boxes[:, 0, None] < boxes[None, :, 3] - EPS
+                in_front &= boxes[None, :, 2] < target_boxes[:, 5, None] - EPS
+                in_front &= target_boxes[:, 2, None] < boxes[None, :, 5] - EPS
+                counts[positions[begin:begin + chunk]] = in_front.sum(axis=1)
+
+        return counts.tolist()
+
+
+def _footprints_overlap(boxes, box):
+    """Mask of boxes whose x/z extent overlaps that of ``box`` by more than a touch."""
+    return (
+        (boxes[:, 0] < box[3] - EPS) & (box[0] < boxes[:, 3] - EPS)
+        & (boxes[:, 2] < box[5] - EPS) & (box[2] < boxes[:, 5] - EPS)
+    )
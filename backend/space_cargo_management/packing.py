@@ -0,0 +1,273 @@
+import bisect
+import math
+from collections import Counter
+
+import numpy as np
+
+# All six axis-aligned orientations of an item, as permutations of (width, depth, height)
+ORIENTATIONS = np.array([
+    (0, 1, 2), (0, 2, 1),
+    (1, 0, 2), (1, 2, 0),
+    (2, 0, 1), (2, 1, 0),
+])
+
+EPS = 1e-9
+
+# For each of the six faces of a placed box (low/high on x, y, z): the axis it cuts,
+# the space column it overwrites and the box column it takes the new bound from
+_SPLIT_SIDES = np.arange(6)
+_SPLIT_AXES = np.array([0, 0, 1, 1, 2, 2])
+_SPLIT_COLUMNS = np.array([3, 0, 4, 1, 5, 2])
+_SPLIT_FACES = np.array([0, 3, 1, 4, 2, 5])
+
+# Up to this many pieces per split, one check of all of them costs less than six per-face ones
+_FEW_PIECES = 128
+
+# Size classes of the free-space index: the shortest side grows by this factor from one class to the next
+_CLASS_RATIO = 2 ** 0.5
+
+# Slots a size class starts with; a class that runs out of free slots doubles
+_CLASS_SLOTS = 16
+
+# Bounds of an unused slot: overlaps nothing, and its sides fit nothing
+_EMPTY_BOUNDS = np.array([np.inf, np.inf, np.inf, -np.inf, -np.inf, -np.inf])
+
+
+class ExtremePointPacker:
+    """3D bin packing for one container over its maximal empty spaces.
+
+    Free volume is kept as a set of maximal axis-aligned boxes (``x0, y0,
+    z0, x1, y1, z1``); their minimum corners are the extreme points where an
+    item may be put. For every item all six orientations are tried against
+    the spaces at once and the candidate that is lowest, then back-most,
+    then fits its space most tightly wins. The placed box is then carved out
+    of every space it overlaps.
+
+    The spaces are indexed by size class of their shortest side. Each class
+    owns a block of slots in ``bounds`` (one row per coordinate) and
+    ``sides`` (sorted side lengths), and the blocks are laid out from the
+    smallest class up, so the spaces that can take an item's shortest side
+    are the slots from its class on, found by binary search. A space that
+    is split or consumed just frees its slot and new pieces take free slots
+    of their class, so a placement never moves the other spaces.
+    """
+
+    def __init__(self, container_row, min_size=0.0):
+        self.width = float(container_row["width"])
+        self.depth = float(container_row["depth"])
+        self.height = float(container_row["height"])
+
+        # Spaces thinner than this on any axis cannot hold any item and are discarded
+        self.min_size = float(min_size)
+
+        self.capacity = self.width * self.depth * self.height
+        self.used_volume = 0.0
+
+        # Smallest shortest side of each size class, from a fraction of a unit up to the container
+        longest = max(self.width, self.depth, self.height, 1.0)
+        self.class_sides = [_CLASS_RATIO ** power for power in range(-4, math.ceil(math.log(longest, _CLASS_RATIO)) + 1)]
+        self.class_starts = [size_class * _CLASS_SLOTS for size_class in range(len(self.class_sides) + 1)]
+        # Free slots per class, lowest last since they are taken from the end
+        self.free_slots = [list(range(start + _CLASS_SLOTS - 1, start - 1, -1)) for start in self.class_starts[:-1]]
+        self.bounds = np.repeat(_EMPTY_BOUNDS[:, None], self.class_starts[-1], axis=1)
+        self.sides = np.full((3, self.class_starts[-1]), -np.inf)
+
+        whole = np.array([[0.0, 0.0, 0.0, self.width, self.depth, self.height]])
+        self._add(whole, np.sort(whole[:, 3:] - whole[:, :3], axis=1))
+
+    @property
+    def spaces(self):
+        """The free spaces as rows of ``x0, y0, z0, x1, y1, z1``."""
+        return self.bounds[:, self.sides[0] > -np.inf].T
+
+    def utilization(self):
+        """Fraction of the container volume taken by placed items."""
+        return self.used_volume / self.capacity if self.capacity else 0.0
+
+    def find_position(self, width, depth, height):
+        """Returns (start, size) of the best candidate for an item, or None if nothing fits."""
+        # An item fits a space in some orientation iff its sorted sides fit the space's sorted sides;
+        # spaces of a smaller class than its shortest side can't
+        shortest, middle, longest = (side - EPS for side in sorted((width, depth, height)))
+        first = self.class_starts[self._size_class(shortest)]
+        sides = self.sides[:, first:]
+        fits = (shortest <= sides[0]) & (middle <= sides[1]) & (longest <= sides[2])
+        candidates = np.flatnonzero(fits) + first
+        if candidates.size == 0:
+            return None
+
+        # Narrow down lowest first, then back-most, then best fit, then left-most, then thinnest.
+        # Item volume is constant, so the smallest space is the tightest fit.
+        bounds, sides = self.bounds, self.sides
+        for key in (lambda c: bounds[2, c], lambda c: bounds[1, c], lambda c: sides[:, c].prod(axis=0),
+                    lambda c: bounds[0, c]):
+            values = key(candidates)
+            candidates = candidates[values <= values.min() + EPS]
+            if candidates.size == 1:
+                break
+        space = bounds[:, candidates[np.argmin(sides[0, candidates])]]
+
+        dims = np.array([width, depth, height], dtype=float)[ORIENTATIONS]
+        orientation = np.flatnonzero((dims <= space[3:] - space[:3] + EPS).all(axis=1))[0]
+        return space[:3].copy(), dims[orientation]
+
+    def occupy(self, start, size):
+        """Removes the box [start, start + size) from the free spaces."""
+        box = np.concatenate([start, start + size])
+
+        # Spaces overlapping or touching the box; only the overlapping ones are split
+        near = np.flatnonzero(_overlapping(self.bounds, box, EPS))
+        near_spaces = self.bounds[:, near]
+        overlaps = _overlapping(near_spaces, box, -EPS)
+        if not overlaps.any():
+            return
+        near_spaces = near_spaces.T
+        hit = near_spaces[overlaps]
+
+        # Split each overlapped space into up to six slabs, one per face of the box
+        pieces = np.repeat(hit[None, :, :], 6, axis=0)
+        pieces[_SPLIT_SIDES, :, _SPLIT_COLUMNS] = box[_SPLIT_FACES][:, None]
+        thickness = pieces[_SPLIT_SIDES, :, 3 + _SPLIT_AXES] - pieces[_SPLIT_SIDES, :, _SPLIT_AXES]
+        thick = thickness > max(self.min_size - EPS, EPS)
+        pieces = pieces[thick]
+
+        if pieces.size:
+            # Keep only maximal pieces. Every piece borders the box, so besides other pieces
+            # only kept spaces touching the box can contain one.
+            face_counts = thick.sum(axis=1)  # Pieces come grouped by the face they were cut at
+            pieces = _maximal(pieces, face_counts, box, near_spaces[~overlaps])
+
+        self._remove(near[overlaps])
+        if len(pieces):
+            self._add(pieces, np.sort(pieces[:, 3:] - pieces[:, :3], axis=1))
+
+    def _size_class(self, side):
+        return max(bisect.bisect_right(self.class_sides, side) - 1, 0)
+
+    def _add(self, spaces, sides):
+        """Puts spaces (rows) with their sorted sides into free slots of their size classes."""
+        classes = np.maximum(np.searchsorted(self.class_sides, sides[:, 0], side="right") - 1, 0).tolist()
+        # Grow first: growing moves the classes above, and with them slots already taken
+        for size_class, count in sorted(Counter(classes).items()):
+            while len(self.free_slots[size_class]) < count:
+                self._grow(size_class)
+        slots = [self.free_slots[size_class].pop() for size_class in classes]
+        self.bounds[:, slots] = spaces.T
+        self.sides[:, slots] = sides.T
+
+    def _remove(self, slots):
+        self.bounds[:, slots] = _EMPTY_BOUNDS[:, None]
+        self.sides[:, slots] = -np.inf
+        for slot in slots.tolist():
+            self.free_slots[bisect.bisect_right(self.class_starts, slot) - 1].append(slot)
+
+    def _grow(self, size_class):
+        """Doubles the slots of a size class; the classes above move up."""
+        start, stop = self.class_starts[size_class], self.class_starts[size_class + 1]
+        extra = stop - start
+        self.bounds = np.concatenate(
+            [self.bounds[:, :stop], np.repeat(_EMPTY_BOUNDS[:, None], extra, axis=1), self.bounds[:, stop:]], axis=1
+        )
+        self.sides = np.concatenate([self.sides[:, :stop], np.full((3, extra), -np.inf), self.sides[:, stop:]], axis=1)
+        for above in range(size_class + 1, len(self.class_starts)):
+            self.class_starts[above] += extra
+        for above in range(size_class + 1, len(self.free_slots)):
+            self.free_slots[above] = [slot + extra for slot in self.free_slots[above]]
+        self.free_slots[size_class][:0] = range(stop + extra - 1, stop - 1, -1)
+
+    def reserve(self, position):
+        """Marks an already decided placement (start_x, ..., end_z) as used."""
+        start = np.array(position[:3], dtype=float)
+        size = np.array(position[3:], dtype=float) - start
+        self.occupy(start, size)
+        self.used_volume += float(size.prod())
+
+    def place_item(self, item_row):
+        """Places an item in its best orientation and position, or returns None."""
+        candidate = self.find_position(item_row["width"], item_row["depth"], item_row["height"])
+        if candidate is None:
+            return None  # No space found
+
+        start, size = candidate
+        self.occupy(start, size)
+        self.used_volume += float(size.prod())
+
+        end = start + size
+        return (
+            float(start[0]), float(start[1]), float(start[2]),
+            float(end[0]), float(end[1]), float(end[2])
+        )  # Same coordinates as Octree.place_item, end reflects the chosen orientation
+
+
+def _overlapping(bounds, box, tolerance):
+    """Mask of spaces (columns of ``bounds``) intersecting the box; a negative tolerance ignores touching faces."""
+    mask = bounds[0] < box[3] + tolerance
+    for axis in range(3):
+        if axis:
+            mask &= bounds[axis] < box[3 + axis] + tolerance
+        mask &= box[axis] < bounds[3 + axis] + tolerance
+    return mask
+
+
+def _maximal(pieces, face_counts, box, others):
+    """Drops pieces contained in another piece or in any of ``others``; keeps one of each duplicate.
+
+    ``face_counts`` gives how many of the (consecutive) pieces were cut at
+    each face of ``box``. A piece cut at a face reaches past it and spans
+    the box on the other two axes, so only a space doing the same can hold
+    it: another piece of that face, or one of ``others`` reaching past that
+    face. Many pieces are therefore checked face by face, against those
+    candidates only, instead of every piece against everything.
+    """
+    if len(pieces) <= _FEW_PIECES:
+        dominated = _dominated(pieces)
+        if others.size:
+            dominated |= _contained(pieces, others).any(axis=1)
+        return pieces[~dominated]
+
+    # across[:, a]: the space overlaps the box's extent on axis a
+    across = (others[:, 3:] > box[:3]) & (others[:, :3] < box[3:])
+    flanking = np.repeat(np.stack([
+        across[:, 1] & across[:, 2], across[:, 0] & across[:, 2], across[:, 0] & across[:, 1],
+    ], axis=1), 2, axis=1)
+    # reaching[:, face]: the space reaches past that face (low x, high x, low y, ...) and spans the box beside it
+    reaching = np.stack([others[:, :3] < box[:3], others[:, 3:] > box[3:]], axis=2).reshape(-1, 6) & flanking
+
+    dominated = np.zeros(len(pieces), dtype=bool)
+    end = 0
+    for face, count in enumerate(face_counts.tolist()):
+        start, end = end, end + count
+        if count == 0:
+            continue
+        block = pieces[start:end]
+        if count > 1:
+            dominated[start:end] = _dominated(block)
+        candidates = others[reaching[:, face]]
+        if candidates.size:
+            dominated[start:end] |= _contained(block, candidates).any(axis=1)
+
+    return pieces[~dominated]
+
+
+def _dominated(pieces):
+    """Mask of pieces lying in a strictly larger piece, or in an identical one earlier in the list."""
+    inside = _contained(pieces, pieces)  # inside[i, j]: piece i lies in piece j
+    order = np.arange(len(pieces))
+    return (inside & (~inside.T | (order[None, :] < order[:, None]))).any(axis=1)
+
+
+def _contained(boxes, containers):
+    """Matrix whose [i, j] entry says boxes[i] lies inside containers[j].
+
+    Compared column by column: reducing over a trailing axis of length three
+    is far slower in NumPy than six 2D comparisons.
+    """
+    lower = boxes[:, :3] + EPS
+    upper = boxes[:, 3:] - EPS
+    result = containers[None, :, 0] <= lower[:, 0, None]
+    result &= containers[None, :, 1] <= lower[:, 1, None]
+    result &= containers[None, :, 2] <= lower[:, 2, None]
+    result &= upper[:, 0, None] <= containers[None, :, 3]
+    result &= upper[:, 1, None] <= containers[None, :, 4]
+    result &= upper[:, 2, None] <= containers[None, :, 5]
+    return result
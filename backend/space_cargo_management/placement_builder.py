@@ -0,0 +1,43 @@
+import numpy as np
+import polars as pl
+
+# Coordinate columns of a placement, in the order placement indexes return them
+COORDINATE_COLUMNS = ["start_x", "start_y", "start_z", "end_x", "end_y", "end_z"]
+
+
+class PlacementBuilder:
+    """Collects placements in typed column buffers and builds one DataFrame at the end.
+
+    Coordinates go into a float64 array that doubles when full and ids into
+    plain lists, so appending a placement costs amortized O(1) and nothing
+    is allocated per row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.item_ids = []
+        self.zones = []
+        self.coordinates = np.empty((max(1, capacity), len(COORDINATE_COLUMNS)), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def append(self, item_id, zone, position):
+        """Adds one placement; ``position`` is (start_x, start_y, start_z, end_x, end_y, end_z)."""
+        row = len(self.item_ids)
+        if row == len(self.coordinates):
+            self.coordinates = np.concatenate([self.coordinates, np.empty_like(self.coordinates)])
+
+        self.coordinates[row] = position
+        self.item_ids.append(item_id)
+        self.zones.append(zone)
+
+    def build(self) -> pl.DataFrame:
+        """Materializes every collected placement as a single DataFrame."""
+        rows = len(self.item_ids)
+        columns = {
+            "itemId": pl.Series("itemId", self.item_ids).cast(pl.Utf8),
+            "zone": pl.Series("zone", self.zones, dtype=pl.Utf8),
+        }
+        for index, name in enumerate(COORDINATE_COLUMNS):
+            columns[name] = pl.Series(name, self.coordinates[:rows, index])
+        return pl.DataFrame(columns)
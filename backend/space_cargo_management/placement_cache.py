@@ -0,0 +1,94 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import polars as pl
+
+import config
+
+
+def placement_key(*parts: str) -> str:
+    """Stable digest of the parts that determine a placement result."""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        data = part.encode()
+        digest.update(len(data).to_bytes(8, "little"))  # Length-prefixed, so parts can't run together
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def result_size(placement_result: pl.DataFrame) -> int:
+    """Approximate bytes held by a placement result and the frames nested in it."""
+    size = 0
+    for column in ("placements", "rearrangements", "utilization"):
+        if column in placement_result.columns:
+            frame = placement_result[column][0]
+            if isinstance(frame, pl.DataFrame):
+                size += frame.estimated_size()
+    return size
+
+
+class PlacementCache:
+    """LRU cache of placement results, bounded by entry count and by bytes.
+
+    Keys are content digests (see ``placement_key``). Only full runs are
+    cached: an incremental run packs on top of whatever the shared state
+    holds, so it is never cached. Each entry also keeps the state version
+    right after its result was applied, which tells a repeated request
+    whether the state still holds that result.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, version, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[pl.DataFrame, int]]:
+        """(result, state version it was applied at) for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key: str, result: pl.DataFrame, version: int):
+        size = result_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return  # Would evict everything else and still not fit
+            self._entries[key] = (result, version, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _drop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+# Shared by all requests of this process
+placement_cache = PlacementCache(config.PLACEMENT_CACHE_ENTRIES, config.PLACEMENT_CACHE_BYTES)
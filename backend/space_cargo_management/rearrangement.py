@@ -0,0 +1,183 @@
+import copy
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import polars as pl
+
+from placement_builder import COORDINATE_COLUMNS
+
+EPS = 1e-9
+
+
+class RearrangementPlanner:
+    """Makes room for items that found no spot by moving lower-priority items to other zones.
+
+    Unplaced items are handled highest priority first. An item may displace
+    items of its preferred zone with a lower priority, lowest priority (then
+    largest) first; displaced items go to the first other zone with room.
+    For each item, until the time budget runs out:
+
+    1. Retry: earlier moves may already have made room.
+    2. Swap: one item whose box holds the new one in some orientation is
+       moved out, and the new item takes its spot. The zone's index is left
+       as is, since the spot stays occupied.
+    3. Clear: on copies of the indexes, items are moved out one by one until
+       the new item fits in the zone rebuilt without them. Moved items that
+       turn out not to be needed are then kept in place.
+
+    Plans are applied as they are found, so later items see earlier moves.
+    Works with any index that has ``place_item`` and an exact ``reserve``.
+    """
+
+    def __init__(self, system, deadline: float):
+        self.system = system
+        self.deadline = deadline
+        self.timed_out = False  # The deadline passed with items still unplaced
+        self.moves = []  # (itemId, from zone, from box, to zone, to box), in order
+        self.placed = []  # (itemId, zone, box)
+        self._zones: Dict[str, Dict[str, tuple]] = {}  # zone -> {itemId: box}, in placement order
+
+    def plan(self, unplaced_df: pl.DataFrame) -> List[str]:
+        """Tries to place every unplaced item; returns the itemIds still without a spot."""
+        still_unplaced = []
+        for item_row in unplaced_df.sort("priority", descending=True, maintain_order=True).iter_rows(named=True):
+            zone = str(item_row["preferredZone"]).strip()
+            if zone not in self.system.octrees or time.perf_counter() > self.deadline or not self._make_room(zone, item_row):
+                still_unplaced.append(item_row["itemId"])
+        self.timed_out = bool(still_unplaced) and time.perf_counter() > self.deadline
+        return still_unplaced
+
+    def _make_room(self, zone: str, item_row: dict) -> bool:
+        box = self.system.octrees[zone].place_item(item_row)
+        if box is not None:
+            self._place(item_row, zone, box)
+            return True
+
+        candidates = self._candidates(zone, item_row["priority"])
+        if not candidates:
+            return False
+        return self._swap(zone, item_row, candidates) or self._clear(zone, item_row, candidates)
+
+    def _swap(self, zone: str, item_row: dict, candidates: List[dict]) -> bool:
+        sides = np.sort([item_row["width"], item_row["depth"], item_row["height"]])
+        for candidate in candidates:
+            start, end = np.array(candidate["box"][:3]), np.array(candidate["box"][3:])
+            if np.any(sides > np.sort(end - start) + EPS):
+                continue
+            target = self._relocate(candidate, lambda other: self.system.octrees[other], exclude=zone)
+            if target is None:
+                continue
+
+            # Put the item in the freed box, in the first orientation that fits
+            size = end - start
+            for dims in ((0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)):
+                oriented = np.array([item_row["width"], item_row["depth"], item_row["height"]])[list(dims)]
+                if np.all(oriented <= size + EPS):
+                    break
+            self._move(candidate, zone, *target)
+            self._place(item_row, zone, tuple(float(v) for v in np.concatenate([start, start + oriented])))
+            return True
+        return False
+
+    def _clear(self, zone: str, item_row: dict, candidates: List[dict]) -> bool:
+        moved = []
+        for candidate in candidates:
+            if time.perf_counter() > self.deadline:
+                return False
+            moved.append(candidate)
+            trial = self._trial(zone, item_row, moved)
+            if trial is None:
+                moved.pop()  # Nowhere else to go; leave it
+                continue
+            if trial[0] is None:
+                continue  # Still no room; move more
+
+            # Keep in place whatever the item can do without, most important first
+            for candidate in sorted(moved[:-1], key=lambda c: -c["priority"]):
+                if time.perf_counter() > self.deadline:
+                    break
+                fewer = [c for c in moved if c is not candidate]
+                fewer_trial = self._trial(zone, item_row, fewer)
+                if fewer_trial is not None and fewer_trial[0] is not None:
+                    moved, trial = fewer, fewer_trial
+
+            box, index, indexes, targets = trial
+            self.system.octrees.update(indexes)
+            self.system.octrees[zone] = index
+            for candidate, target in zip(moved, targets):
+                self._move(candidate, zone, *target)
+            self._place(item_row, zone, box)
+            return True
+        return False
+
+    def _trial(self, zone: str, item_row: dict, moved: List[dict]):
+        """Moves ``moved`` out of ``zone`` on copies of the indexes and tries the item there.
+
+        Returns None if some moved item has nowhere to go, else
+        (box or None, rebuilt zone index, other copied indexes, move targets).
+        """
+        indexes = {}
+
+        def copied(other):
+            if other not in indexes:
+                indexes[other] = copy.deepcopy(self.system.octrees[other])
+            return indexes[other]
+
+        targets = []
+        for candidate in moved:
+            target = self._relocate(candidate, copied, exclude=zone)
+            if target is None:
+                return None
+            targets.append(target)
+
+        moved_ids = {candidate["itemId"] for candidate in moved}
+        remaining = [box for item_id, box in self._zone(zone).items() if item_id not in moved_ids]
+        index = self.system.build_index(zone, pl.DataFrame(remaining, schema=COORDINATE_COLUMNS, orient="row"))
+        if hasattr(index, "min_size"):
+            index.min_size = min(index.min_size, float(min(item_row["width"], item_row["depth"], item_row["height"])))
+        return index.place_item(item_row), index, indexes, targets
+
+    def _relocate(self, candidate: dict, index_of, exclude: str):
+        """Places a displaced item in the first other zone with room; returns (zone, box) or None."""
+        for other in self.system.octrees:
+            if other == exclude:
+                continue
+            box = index_of(other).place_item(candidate["row"])
+            if box is not None:
+                return other, box
+        return None
+
+    def _candidates(self, zone: str, priority) -> List[dict]:
+        """Items of ``zone`` with a lower priority, lowest priority then largest first."""
+        placed = self._zone(zone)
+        if not placed:
+            return []
+        system = self.system
+        rows = [system.search_index.row(item_id) for item_id in placed]
+        known = [(item_id, row) for item_id, row in zip(placed, rows) if row is not None]
+        items_df = system.items_df[[row for _, row in known]]
+        candidates = []
+        for (item_id, _), item in zip(known, items_df.iter_rows(named=True)):
+            if item["priority"] < priority:
+                box = placed[item_id]
+                volume = (box[3] - box[0]) * (box[4] - box[1]) * (box[5] - box[2])
+                candidates.append({"itemId": item_id, "priority": item["priority"], "volume": volume, "box": box, "row": item})
+        candidates.sort(key=lambda c: (c["priority"], -c["volume"]))
+        return candidates
+
+    def _zone(self, zone: str) -> Dict[str, tuple]:
+        if zone not in self._zones:
+            zone_df = self.system.placements_df.filter(pl.col("zone") == zone)
+            self._zones[zone] = dict(zip(zone_df["itemId"].to_list(), zone_df.select(COORDINATE_COLUMNS).iter_rows()))
+        return self._zones[zone]
+
+    def _move(self, candidate: dict, from_zone: str, to_zone: str, to_box: tuple):
+        del self._zone(from_zone)[candidate["itemId"]]
+        self._zone(to_zone)[candidate["itemId"]] = to_box
+        self.moves.append((candidate["itemId"], from_zone, candidate["box"], to_zone, to_box))
+
+    def _place(self, item_row: dict, zone: str, box: tuple):
+        item_id = str(item_row["itemId"])
+        self._zone(zone)[item_id] = box
+        self.placed.append((item_id, zone, box))
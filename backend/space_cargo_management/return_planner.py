@@ -0,0 +1,212 @@
+import time
+from typing import Optional
+
+import numpy as np
+
+# Weights are compared in steps of this many kg by the dynamic program
+WEIGHT_RESOLUTION = 0.01
+
+# Weightings of the two limits tried when picking the surrogate with the tightest LP bound
+SURROGATE_STEPS = 21
+
+# The dynamic program runs when items × weight steps stays below this (one byte each)
+DP_MAX_CELLS = 20_000_000
+
+EPS = 1e-9
+
+
+class ReturnPlan:
+    """Chosen items of a return plan and how close to optimal they are.
+
+    ``upper_bound`` is a proven bound on the best achievable value, so
+    ``gap`` is the most the plan can fall short by, relative to it.
+    """
+
+    def __init__(self, selected: np.ndarray, value: float, upper_bound: float, method: str):
+        self.selected = selected
+        self.value = float(value)
+        self.upper_bound = float(max(upper_bound, value))
+        self.method = method
+
+    @property
+    def gap(self) -> float:
+        return 0.0 if self.upper_bound <= EPS else (self.upper_bound - self.value) / self.upper_bound
+
+    @property
+    def optimal(self) -> bool:
+        return self.gap <= 1e-9
+
+    def report(self) -> dict:
+        return {"method": self.method, "value": self.value, "upperBound": self.upper_bound,
+                "gap": round(float(self.gap), 6), "optimal": bool(self.optimal)}
+
+
+def plan_return(values, weights, volumes, max_weight: float, max_volume: Optional[float],
+                time_limit: float = 0.5) -> ReturnPlan:
+    """Picks items maximizing total value with total weight <= ``max_weight``
+    and total volume <= ``max_volume`` (None for no volume limit).
+
+    Only one limit binds when everything fits under the other; then an
+    exact dynamic program over weight steps is used if it is small enough.
+    Otherwise a depth-first branch and bound starts from the greedy plan and
+    improves it until it is proven optimal or ``time_limit`` seconds pass.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    max_volume = np.inf if max_volume is None else max_volume
+
+    # Items that can't go on their own never will
+    candidates = np.flatnonzero((weights <= max_weight + EPS) & (volumes <= max_volume + EPS) & (values > 0))
+    if len(candidates) == 0:
+        return ReturnPlan(candidates, 0.0, 0.0, "trivial")
+    values, weights, volumes = values[candidates], weights[candidates], volumes[candidates]
+
+    weight_binds = weights.sum() > max_weight + EPS
+    volume_binds = volumes.sum() > max_volume + EPS
+    if not weight_binds and not volume_binds:
+        return ReturnPlan(candidates, float(values.sum()), float(values.sum()), "all")
+
+    if weight_binds and not volume_binds:
+        steps = int(np.floor(max_weight / WEIGHT_RESOLUTION + EPS))
+        if len(values) * (steps + 1) <= DP_MAX_CELLS and _on_grid(weights):
+            chosen = _knapsack_dp(values, np.round(weights / WEIGHT_RESOLUTION).astype(np.int64), steps)
+            value = float(values[chosen].sum())
+            return ReturnPlan(candidates[chosen], value, value, "dynamic_programming")
+
+    chosen, value, upper_bound = _branch_and_bound(
+        values, weights, volumes, max_weight if weight_binds else np.inf, max_volume if volume_binds else np.inf, time_limit
+    )
+    method = "branch_and_bound" if value >= upper_bound - EPS else "branch_and_bound_time_limited"
+    return ReturnPlan(candidates[chosen], value, upper_bound, method)
+
+
+def _on_grid(weights: np.ndarray) -> bool:
+    """Whether every weight is a whole number of WEIGHT_RESOLUTION steps, so the DP is exact."""
+    scaled = weights / WEIGHT_RESOLUTION
+    return bool(np.all(np.abs(scaled - np.round(scaled)) <= 1e-6))
+
+
+def _knapsack_dp(values: np.ndarray, weights: np.ndarray, capacity: int) -> np.ndarray:
+    """0/1 knapsack over integer weights, one vectorized pass per item; returns the chosen rows."""
+    best = np.zeros(capacity + 1, dtype=np.float64)
+    taken = np.zeros((len(values), capacity + 1), dtype=bool)
+    for item, (value, weight) in enumerate(zip(values.tolist(), weights.tolist())):
+        if weight > capacity:
+            continue
+        with_item = best[:capacity + 1 - weight] + value
+        improves = with_item > best[weight:] + EPS
+        taken[item, weight:] = improves
+        best[weight:] = np.where(improves, with_item, best[weight:])
+
+    chosen = []
+    remaining = int(np.argmax(best))
+    for item in range(len(values) - 1, -1, -1):
+        if taken[item, remaining]:
+            chosen.append(item)
+            remaining -= int(weights[item])
+    return np.array(sorted(chosen), dtype=np.int64)
+
+
+def _fractional_bound(values: np.ndarray, sizes: np.ndarray, capacity: float) -> float:
+    """Best value of the LP relaxation under a single size limit."""
+    if not np.isfinite(capacity):
+        return float(values.sum())
+    order = np.argsort(-(values / np.maximum(sizes, EPS)), kind="stable")
+    filled = np.cumsum(sizes[order])
+    whole = int(np.searchsorted(filled, capacity + EPS, side="right"))
+    bound = float(values[order[:whole]].sum())
+    if whole < len(order):
+        left = capacity - (filled[whole - 1] if whole else 0.0)
+        bound += float(values[order[whole]]) * max(0.0, left) / max(float(sizes[order[whole]]), EPS)
+    return bound
+
+
+def _branch_and_bound(values, weights, volumes, max_weight, max_volume, time_limit):
+    """Depth-first branch and bound on a surrogate of both limits.
+
+    The surrogate limit is ``share`` times the weight limit plus
+    ``1 - share`` times the volume limit, both as fractions; any plan within
+    both limits is within it, so its LP bound is an upper bound. The share
+    with the lowest bound is used (an infinite limit gets no share but is
+    still checked). Items are branched in order of value per surrogate size
+    and a node is cut when the LP bound of the items left can't beat the
+    best plan. The returned upper bound is that lowest LP bound, or the
+    best value once the search completed.
+    """
+    deadline = time.perf_counter() + time_limit
+    weight_fractions = weights / max(max_weight, EPS) if np.isfinite(max_weight) else None
+    volume_fractions = volumes / max(max_volume, EPS) if np.isfinite(max_volume) else None
+    if weight_fractions is None or volume_fractions is None:
+        shares = [1.0 if volume_fractions is None else 0.0]
+    else:
+        shares = np.linspace(0.0, 1.0, SURROGATE_STEPS)
+
+    root_bound, weight_scale, volume_scale = np.inf, 0.0, 0.0
+    for share in shares:
+        share_sizes = (share * weight_fractions if share else 0.0) + ((1.0 - share) * volume_fractions if share < 1.0 else 0.0)
+        share_bound = _fractional_bound(values, share_sizes, 1.0)
+        if share_bound < root_bound:
+            root_bound = share_bound
+            weight_scale = share / max(max_weight, EPS) if share else 0.0
+            volume_scale = (1.0 - share) / max(max_volume, EPS) if share < 1.0 else 0.0
+
+    sizes = weights * weight_scale + volumes * volume_scale
+    order = np.argsort(-(values / np.maximum(sizes, EPS)), kind="stable")
+    values, weights, volumes, sizes = values[order], weights[order], volumes[order], sizes[order]
+
+    # Suffix sums let the surrogate bound of items i.. be found by binary search
+    size_prefix = np.concatenate([[0.0], np.cumsum(sizes)])
+    value_prefix = np.concatenate([[0.0], np.cumsum(values)])
+    count = len(values)
+
+    def bound(index, value, used_weight, used_volume):
+        left = 0.0
+        if weight_scale:
+            left += (max_weight - used_weight) * weight_scale
+        if volume_scale:
+            left += (max_volume - used_volume) * volume_scale
+        stop = int(np.searchsorted(size_prefix, size_prefix[index] + left + EPS, side="right")) - 1
+        stop = max(index, min(stop, count))
+        total = value + value_prefix[stop] - value_prefix[index]
+        if stop < count:
+            total += values[stop] * max(0.0, left - (size_prefix[stop] - size_prefix[index])) / max(sizes[stop], EPS)
+        return total
+
+    # Greedy plan in branching order as the first incumbent
+    best_take = np.zeros(count, dtype=bool)
+    used_weight = used_volume = 0.0
+    for index in range(count):
+        if used_weight + weights[index] <= max_weight + EPS and used_volume + volumes[index] <= max_volume + EPS:
+            best_take[index] = True
+            used_weight += weights[index]
+            used_volume += volumes[index]
+    best_value = float(values[best_take].sum())
+
+    # Explicit stack of (index, value, weight, volume, path); "take" is explored first.
+    # A path is (taken item, parent path) or None, so extending it costs O(1)
+    stack = [(0, 0.0, 0.0, 0.0, None)]
+    completed = True
+    nodes = 0
+    while stack:
+        nodes += 1
+        if nodes % 1024 == 0 and time.perf_counter() > deadline:
+            completed = False
+            break
+        index, value, used_weight, used_volume, path = stack.pop()
+        if value > best_value + EPS:
+            best_value = value
+            best_take = np.zeros(count, dtype=bool)
+            step = path
+            while step is not None:
+                best_take[step[0]] = True
+                step = step[1]
+        if index == count or bound(index, value, used_weight, used_volume) <= best_value + EPS:
+            continue
+        stack.append((index + 1, value, used_weight, used_volume, path))
+        if used_weight + weights[index] <= max_weight + EPS and used_volume + volumes[index] <= max_volume + EPS:
+            stack.append((index + 1, value + values[index], used_weight + weights[index],
+                          used_volume + volumes[index], (index, path)))
+
+    upper_bound = best_value if completed else max(best_value, root_bound)
+    return np.sort(order[best_take]), best_value, upper_bound
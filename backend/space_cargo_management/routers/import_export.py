@@ -1,9 +1,19 @@
-import csv
-import io
+import asyncio
 import polars as pl
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, UploadFile, File, Response
-from schemas import CargoPlacementSystem, ImportItemsResponse, ImportContainersResponse, CargoArrangementExport, Coordinates
+from functools import partial
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import config
+from arrangement_export import EXPORT_FORMATS, gzip_chunks
+from csv_stream import iter_csv_chunks
+from jobs import Job, JobQueueFull, job_manager
+from log_writer import action_log
+from metrics import metrics
+from validation import ITEM_FIELDS, ITEM_CHECKS, CONTAINER_FIELDS, CONTAINER_CHECKS, raw_frame, validate_frame
+from schemas import ImportItemsResponse, ImportContainersResponse, CargoArrangementExport, Coordinates
+from state import shared_state
 import polars as pl
 import json
 
@@ -12,24 +22,8 @@ router = APIRouter(
     tags=["import-export"]
 )
 
-cargo_system = CargoPlacementSystem()
-
-LOG_FILE = "logs.csv"
-
-# DataFrame to store logs
-log_columns = ["timestamp", "userId", "actionType", "itemId", "details"]
-logs_df = pl.DataFrame(schema={
-    "timestamp": pl.Utf8,
-    "userId": pl.Utf8,
-    "actionType": pl.Utf8,
-    "itemId": pl.Utf8,
-    "details": pl.Utf8  # Store details as a string (JSON)
-})
-
-
 def log_action(actionType: str, details: dict = None, userId: str = "", itemId: str = ""):
-    global logs_df
-
+    """Queue an action log record; the shared writer appends it to disk in the background."""
     if not isinstance(details, dict):  # Ensure details is a dictionary
         details = {"fromContainer": "", "toContainer": "", "reason": str(details)}
 
@@ -39,115 +33,80 @@ def log_action(actionType: str, details: dict = None, userId: str = "", itemId:
         "reason": details.get("reason", "")
     }
 
-    details_json = json.dumps(structured_details)  # Store as JSON string
+    action_log.write({
+        "timestamp": datetime.now(timezone.utc),
+        "userId": userId,
+        "actionType": actionType,
+        "itemId": itemId,
+        "details": json.dumps(structured_details),  # Store as JSON string
+    })
 
-    new_entry = pl.DataFrame(
-        {
-            "timestamp": [datetime.now(timezone.utc).isoformat()],
-            "userId": [userId],
-            "actionType": [actionType],
-            "itemId": [itemId],
-            "details": [details_json],  # Ensure JSON format
-        }
-    )
 
-    logs_df = pl.concat([logs_df, new_entry], how="vertical")
-    logs_df.write_csv(LOG_FILE)
 
+def apply_import(op: str, args: dict, frame: pl.DataFrame):
+    """Journals an import; runs on the thread pool, as BEGIN IMMEDIATE may wait for other writers."""
+    with shared_state.write() as state:
+        state.apply(op, args, frame)
 
 
-def convert_csv_to_json(file_contents: str):
-    """ Convert CSV data to a list of dictionaries (JSON format). """
-    reader = csv.DictReader(io.StringIO(file_contents))
-    return [row for row in reader]
+async def import_csv(file: UploadFile, fields: list, checks: list):
+    """Streams an uploaded CSV through the validation pipeline chunk by chunk.
 
-### **1. Import Items from CSV**
-@router.post("/import/items", response_model=ImportItemsResponse)
-async def import_items(file: UploadFile = File(...)):
+    Only one chunk of raw text is held at a time; each chunk is coerced and
+    checked as a whole and its valid rows kept as a typed DataFrame. Returns
+    the concatenated frame (or None if no row was valid) and the per-row
+    errors, numbered from the first data row.
+    """
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed.")
 
+    required_columns = {field.name for field in fields}
+    frames = []
+    errors = []
+    row_number = 0
+    header = None
+
     try:
-        contents = await file.read()
-        decoded_contents = contents.decode("utf-8").strip()
-    except Exception as e:
+        async for header, rows in iter_csv_chunks(file, config.IMPORT_CHUNK_BYTES):
+            # Validate required columns once the header has arrived
+            if row_number == 0 and not required_columns.issubset(set(header)):
+                missing_columns = required_columns - set(header)
+                raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_columns}")
+            if not rows:
+                continue
+
+            with metrics.span("import.validate"):
+                valid_df, chunk_errors = validate_frame(raw_frame(header, rows), fields, checks, first_row=row_number + 1)
+            row_number += len(rows)
+            errors.extend(chunk_errors)
+            if not valid_df.is_empty():
+                frames.append(valid_df)
+    except UnicodeDecodeError as e:
         raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
 
-    if not decoded_contents:
+    if header is None:
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    # Validate required columns
-    reader = csv.DictReader(io.StringIO(decoded_contents))
-    required_columns = {"itemId", "name", "width", "depth", "height", "mass", "priority", "expiryDate", "usageLimit", "preferredZone"}
-
-    if not required_columns.issubset(set(reader.fieldnames or [])):
-        missing_columns = required_columns - set(reader.fieldnames or [])
-        raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_columns}")
+    return (pl.concat(frames, rechunk=False) if frames else None), errors
 
-    # Convert CSV to JSON
-    items_json = convert_csv_to_json(decoded_contents)
 
-    items = []
-    errors = []
+### **1. Import Items from CSV**
+@router.post("/import/items", response_model=ImportItemsResponse)
+async def import_items(file: UploadFile = File(...)):
+    items_df, errors = await import_csv(file, ITEM_FIELDS, ITEM_CHECKS)
+    items_imported = items_df.height if items_df is not None else 0
 
-    for row_number, row in enumerate(items_json, start=1):
-        try:
-            # Convert and validate required fields
-            itemId = row["itemId"]
-            width = float(row["width"])
-            depth = float(row["depth"])
-            height = float(row["height"])
-            mass = float(row["mass"])
-            priority_value = int(row["priority"])
-            preferredZone = row["preferredZone"]
-            name = row["name"]
-
-            if not (1 <= priority_value <= 100):
-                raise ValueError("Priority must be between 1 and 100.")
-
-            # Handle expiry date conversion safely
-            expiryDate = None
-            expiry_date_value = row["expiryDate"].strip().lower()
-            if expiry_date_value not in {"n/a", ""}:
-                try:
-                    expiryDate = expiry_date_value
-                except ValueError:
-                    raise ValueError(f"Invalid date format '{expiry_date_value}'. Use YYYY-MM-DD.")
-
-            # Convert usage limit safely
-            usage_limit_value = row["usageLimit"].split()[0] if " " in row["usageLimit"] else row["usageLimit"]
-            usageLimit = int(usage_limit_value) if usage_limit_value.isdigit() else 0
-
-            # Create item as dictionary matching the expected format
-            item = {
-                "itemId": itemId,
-                "name": name,
-                "width": width,
-                "depth": depth,
-                "height": height,
-                "mass": mass,
-                "priority": priority_value,
-                "expiryDate": expiryDate,
-                "usageLimit": usageLimit,
-                "preferredZone": preferredZone
-            }
-
-            items.append(item)
-
-        except (ValueError, KeyError) as e:
-            errors.append({"row": row_number, "message": str(e)})
-
-    if items:
+    if items_imported:
         try:
-            cargo_system.add_items(items)
-            log_action("Import Items", f"Imported {len(items)} items successfully.")
+            await run_in_threadpool(apply_import, "add_items", {"append": False}, items_df)
+            log_action("Import Items", f"Imported {items_imported} items successfully.")
         except Exception as e:
             log_action("Import Items Failed", f"Error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error processing items: {str(e)}")
 
     return ImportItemsResponse(
         success=len(errors) == 0,
-        itemsImported=len(items),
+        itemsImported=items_imported,
         errors=errors,
         message="Items imported successfully" if len(errors) == 0 else "Some items could not be imported"
     )
@@ -156,51 +115,13 @@ async def import_items(file: UploadFile = File(...)):
 ### **2. Import Containers from CSV**
 @router.post("/import/containers", response_model=ImportContainersResponse)
 async def import_containers(file: UploadFile = File(...)):
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files are allowed.")
+    containers_df, errors = await import_csv(file, CONTAINER_FIELDS, CONTAINER_CHECKS)
+    containers_imported = containers_df.height if containers_df is not None else 0
 
-    try:
-        contents = await file.read()
-        decoded_contents = contents.decode("utf-8").strip()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
-
-    if not decoded_contents:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-
-    # Validate required columns
-    reader = csv.DictReader(io.StringIO(decoded_contents))
-    required_columns = {"containerId", "zone", "width", "depth", "height"}
-
-    if not required_columns.issubset(set(reader.fieldnames or [])):
-        missing_columns = required_columns - set(reader.fieldnames or [])
-        raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_columns}")
-
-    # Convert CSV to JSON
-    containers_json = convert_csv_to_json(decoded_contents)
-
-    containers = []
-    errors = []
-
-    for row_number, row in enumerate(containers_json, start=1):
+    if containers_imported:
         try:
-            container = {
-                "containerId": row["containerId"],
-                "zone": row["zone"],
-                "width": float(row["width"]),
-                "depth": float(row["depth"]),
-                "height": float(row["height"])
-            }
-
-            containers.append(container)
-
-        except (ValueError, KeyError) as e:
-            errors.append({"row": row_number, "message": str(e)})
-
-    if containers:
-        try:
-            cargo_system.add_containers(containers)
-            log_action("Import Containers", f"Imported {len(containers)} containers successfully.")
+            await run_in_threadpool(apply_import, "add_containers", {}, containers_df)
+            log_action("Import Containers", f"Imported {containers_imported} containers successfully.")
         except Exception as e:
             log_action("Import Containers Failed", f"Error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error processing containers: {str(e)}")
@@ -208,53 +129,57 @@ async def import_containers(file: UploadFile = File(...)):
 
     return ImportContainersResponse(
         success=len(errors) == 0,
-        containersImported=len(containers),
+        containersImported=containers_imported,
         errors=errors,
         message="Containers imported successfully" if len(errors) == 0 else "Some containers could not be imported"
     )
 
 
-### **3. Export Cargo Arrangement as CSV**
-@router.get("/export/arrangement")
-async def export_arrangement():
-    try:
-        result = cargo_system.optimize_placement()
-        log_action("Optimize Placement", "Cargo placement optimization executed.")
-
-        print("=== Raw Optimization Result ===")
-        print(result)
+def place_pending(job: Job):
+    """Incremental placement run of an export, on a job worker."""
+    shared_state.optimize(incremental=True, run=partial(job_manager.run, job))
 
-        # Ensure 'placements' exists and is a valid DataFrame
-        placements = None
-        if isinstance(result, pl.DataFrame) and "placements" in result.columns:
-            placements = result["placements"][0] if not result["placements"].is_null()[0] else None
 
-        print("=== Extracted Placements ===")
-        print(placements)
+### **3. Export Cargo Arrangement**
+@router.get("/export/arrangement")
+async def export_arrangement(
+    format: str = Query("csv", description='"csv", "ndjson", "parquet" or "arrow"'),
+    gzip: bool = Query(False, description="Compress the body (Content-Encoding: gzip)")
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Choose from {list(EXPORT_FORMATS)}.")
 
-        if placements is None or placements.is_empty():
+    try:
+        # Items imported since the last run are placed first; existing placements are kept as they are
+        # That run is a job like any other, so the event loop keeps serving while it packs
+        system = shared_state.read().system
+        if system.pending_items and not system.containers_df.is_empty():
+            try:
+                job = job_manager.submit("export", place_pending)
+            except JobQueueFull as e:
+                raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+            await asyncio.wrap_future(job.future)
+            log_action("Optimize Placement", "Placed pending items before export.")
+
+        placements_df = shared_state.read().system.placements_df  # Immutable snapshot, unaffected by later runs
+        if placements_df.is_empty():
             log_action("Export Failed", "No placements available for export.")
             raise HTTPException(status_code=404, detail="No placements available.")
 
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Item ID", "Zone", "Coordinates (W1,D1,H1),(W2,D2,H2)"])
-
-        for placement in placements.iter_rows(named=True):
-            writer.writerow([
-                placement["itemId"],
-                placement["zone"],  # Use zone instead of containerId
-                f"({placement['start_x']},{placement['start_y']},{placement['start_z']}),"
-                f"({placement['end_x']},{placement['end_y']},{placement['end_z']})"
-            ])
+        write_chunks, media_type, extension = EXPORT_FORMATS[format]
+        chunks = write_chunks(placements_df, config.EXPORT_BATCH_ROWS)
+        headers = {"Content-Disposition": f"attachment; filename=arrangement.{extension}"}
+        if gzip:
+            chunks = gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
 
-        output.seek(0)
-        log_action("Export Arrangement", "Exported cargo arrangement successfully.")
+        log_action("Export Arrangement", f"Exporting {placements_df.height} placements as {format}.")
 
-        return Response(output.getvalue(), media_type="text/csv", headers={
-            "Content-Disposition": "attachment; filename=arrangement.csv"
-        })
+        # The body is produced batch by batch while it is sent
+        return StreamingResponse(chunks, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         log_action("Export Failed", f"Error exporting arrangement: {str(e)}")
-        print(f"Export Error: {str(e)}")
+        metrics.count("export.errors")
         raise HTTPException(status_code=500, detail=f"Error exporting arrangement: {str(e)}")
@@ -1,37 +1,132 @@
 from fastapi import APIRouter, HTTPException
-from schemas import CargoPlacementSystem, PlacementRequest, PlacementResponse  # ✅ Import PlacementResponse
+from fastapi.responses import JSONResponse
+from functools import partial
+from typing import List, Optional
+from schemas import Container, PlacementRequest, PlacementResponse  # ✅ Import PlacementResponse
+import asyncio
+import config
+import time
+from jobs import Job, JobCancelled, JobQueueFull, job_manager
+from placement_cache import placement_cache, placement_key
+from state import shared_state
 import polars as pl
 
-# Create CargoPlacementSystem instance
-cargo_system = CargoPlacementSystem()
-
 router = APIRouter(
     prefix="/api/placement",
     tags=["placement"],
 )
 
-@router.post("/", response_model=PlacementResponse)
-async def process_placement(request: PlacementRequest) -> PlacementResponse:
+@router.get("/cache")
+async def placement_cache_stats():
+    """Hit and miss counters of the placement result cache of this process."""
+    return {"success": True, **placement_cache.stats()}
+
+
+def submit_placement(request: PlacementRequest) -> Job:
+    """Checks a placement request and queues it as a job; 429 while the job queue is full."""
     if not request.items or not request.containers:
         raise HTTPException(status_code=400, detail="Items and containers must be provided.")
 
-    # Add items and containers
-    cargo_system.add_items([item.dict() for item in request.items])
-    cargo_system.add_containers([container.dict() for container in request.containers])
+    budget = request.rearrangementTimeBudget
+    budget = config.REARRANGEMENT_TIME_BUDGET if budget is None else max(0.0, budget)
+    # The time budget counts from now, so time spent queued and waiting for the lock is part of it
+    deadline = None if request.timeBudget is None else time.perf_counter() + max(0.0, request.timeBudget)
+    try:
+        return job_manager.submit("placement", run_placement, request, budget, deadline)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
+def run_placement(job: Job, request: PlacementRequest, budget: float, deadline: Optional[float]) -> PlacementResponse:
+    """A placement run, on a job worker thread so the event loop stays free."""
+    with shared_state.write() as state:
+        # Same request, engine and budget give the same result. Incremental runs are not
+        # cached: each starts from the state the one before left, so a repeat never matches
+        key = None if request.incremental else placement_key(
+            request.model_dump_json(exclude={"rearrangementTimeBudget"}), state.system.engine, repr(budget),
+        )
+        cached = placement_cache.get(key) if key is not None else None
+
+        if cached is not None and cached[1] == state.version:
+            # Nothing changed since this very result was applied
+            return placement_response(cached[0], request.containers)
+
+        # Add items and containers
+        state.apply("add_containers", {}, pl.DataFrame([container.dict() for container in request.containers]))
+        state.apply("add_items", {"append": request.incremental}, pl.DataFrame([item.dict() for item in request.items]))
+        added_version = state.version
+
+        if cached is not None:
+            # Adopt the known result instead of packing again
+            state.apply("placements", {"reset": True}, cached[0]["placements"][0])
+            placement_cache.put(key, cached[0], state.version)
+            return placement_response(cached[0], request.containers)
+
+    # Optimize placement, incrementally only the new items on top of the stored state.
+    # Packing runs outside the state lock, so other requests are served meanwhile
+    placement_result, version, packed_version = shared_state.optimize(
+        request.incremental, budget, run=partial(job_manager.run, job), deadline=deadline
+    )
+    # Only if nothing came in between, and not a result that depended on how fast this run was:
+    # neither the whole run nor the rearrangement planner may have run out of time
+    if (key is not None and placement_result["success"][0] and packed_version == added_version
+            and not placement_result["timedOut"][0] and not placement_result["rearrangementTimedOut"][0]):
+        placement_cache.put(key, placement_result, version)
+    return placement_response(placement_result, request.containers)
+
+
+@router.post("/", response_model=PlacementResponse)
+async def process_placement(request: PlacementRequest) -> PlacementResponse:
+    job = submit_placement(request)
+    try:
+        return await asyncio.wrap_future(job.future)
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="The placement run was cancelled.")
+
+
+@router.post("/jobs", status_code=202)
+async def submit_placement_job(request: PlacementRequest):
+    """Starts a placement run in the background; poll the returned job for progress and result."""
+    job = submit_placement(request)
+    return {"success": True, **job.to_dict()}
+
+
+def get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None or job.kind != "placement":
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def placement_job_status(job_id: str):
+    return {"success": True, **get_job(job_id).to_dict()}
+
+
+@router.get("/jobs/{job_id}/result", response_model=PlacementResponse)
+async def placement_job_result(job_id: str):
+    job = get_job(job_id)
+    if job.status != "succeeded":
+        return JSONResponse(status_code=409, content={"success": False, **job.to_dict()})
+    return job.result
+
 
-    # Optimize placement
-    placement_result = cargo_system.optimize_placement()
+@router.delete("/jobs/{job_id}")
+async def cancel_placement_job(job_id: str):
+    """Cancels a queued run at once; a running one stops at its next progress report."""
+    job = job_manager.cancel(get_job(job_id).id)
+    return {"success": True, **job.to_dict()}
 
-    # Debugging logs
-    print("Placement Result:", placement_result)
 
+def placement_response(placement_result: pl.DataFrame, containers: List[Container]) -> PlacementResponse:
+    """The API response for a placement result; placements are reported per container."""
     # Extract success value
     success = False
     if "success" in placement_result.columns and not placement_result["success"].is_empty():
         success = placement_result["success"].item(0)
 
     # Create a mapping from zone to containerId
-    container_map = {container.zone.strip(): container.containerId for container in request.containers}
+    container_map = {container.zone.strip(): container.containerId for container in containers}
     
     # Convert placements DataFrame to list of ItemPlacement objects with the new coordinate format
     placements = []
@@ -117,5 +212,6 @@ async def process_placement(request: PlacementRequest) -> PlacementResponse:
     return PlacementResponse(
         success=success,
         placements=placements,
-        rearrangements=rearrangements
+        rearrangements=rearrangements,
+        timedOut=bool(placement_result["timedOut"].item(0)) if "timedOut" in placement_result.columns else False,
     )
\ No newline at end of file
@@ -1,87 +1,196 @@
 from fastapi import APIRouter, HTTPException, Query
+import json
 import polars as pl
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import List, Optional
 
-# Assume CargoPlacementSystem manages the storage
-from schemas import CargoPlacementSystem
-
-# Create instance of CargoPlacementSystem
-cargo_system = CargoPlacementSystem()
+from log_writer import action_log
+from schemas import BatchPlaceRequest, BatchRetrieveRequest, BatchSearchRequest, RetrieveEvent
+from state import shared_state
 
 router = APIRouter(
     prefix="/api",
     tags=["search_retrieve"],
 )
 
+def retrieval_steps(cargo_system, item_data: dict) -> list:
+    """Steps to take an item out: move every blocking item aside, front-most first,
+    retrieve the item, then put the blocking items back in reverse order."""
+    blockers = []
+    for blocker_id in cargo_system.occlusion_index().blockers(item_data["itemId"]):
+        blocker = cargo_system.get_item(blocker_id)
+        blockers.append({"itemId": blocker_id, "itemName": blocker["name"] if blocker else None})
+
+    actions = [(action, blocker) for blocker in blockers for action in ("remove", "setAside")]
+    actions.append(("retrieve", {"itemId": item_data["itemId"], "itemName": item_data["name"]}))
+    actions += [("placeBack", blocker) for blocker in reversed(blockers)]
+
+    return [
+        {"step": step, "action": action, "itemId": item["itemId"], "itemName": item["itemName"]}
+        for step, (action, item) in enumerate(actions, start=1)
+    ]
+
+
 @router.get("/search")
-async def search_item(
+def search_item(
     itemId: str = Query(None), 
     itemName: str = Query(None),
     userId: str = Query(None)
 ):
     if not itemId and not itemName:
         raise HTTPException(status_code=400, detail="Either 'itemId' or 'itemName' must be provided.")
+    cargo_system = shared_state.read().system
 
-    # Filter items in the DataFrame
+    # Look the item up in the search index instead of scanning the DataFrame
     if itemId:
-        result_df = cargo_system.items_df.filter(pl.col("itemId") == itemId)
+        item_data = cargo_system.get_item(itemId)
     else:
-        result_df = cargo_system.items_df.filter(pl.col("name") == itemName)
+        matches = cargo_system.search_index.find_name(itemName)
+        item_data = cargo_system.get_item(matches[0]) if matches else None
 
-    if result_df.is_empty():
+    if item_data is None:
         return {"success": True, "found": False, "item": None, "retrievalSteps": []}
 
-    item_data = result_df.to_dicts()[0]  # Convert to dictionary for response
-
-    # Generate retrieval steps (dummy logic)
-    retrieval_steps = [
-        {"step": 1, "action": "remove", "itemId": item_data["itemId"], "itemName": item_data["name"]},
-        {"step": 2, "action": "retrieve", "itemId": item_data["itemId"], "itemName": item_data["name"]}
-    ]
-
     return {
         "success": True,
         "found": True,
         "item": item_data,
-        "retrievalSteps": retrieval_steps
+        "retrievalSteps": retrieval_steps(cargo_system, item_data)
     }
 
 
-@router.post("/retrieve")
-async def retrieve_item(itemId: str, userId: str, timestamp: str):
-    # Check if the item exists
-    result_df = cargo_system.items_df.filter(pl.col("itemId") == itemId)
-    if result_df.is_empty():
-        raise HTTPException(status_code=404, detail="Item not found.")
-
-    # Update usage count (dummy logic, assuming we track it)
-    cargo_system.items_df = cargo_system.items_df.with_columns(
-        (pl.when(pl.col("itemId") == itemId)
-         .then(pl.col("usageCount") + 1)
-         .otherwise(pl.col("usageCount"))).alias("usageCount")
-    )
-
-    # Log the retrieval (for analytics)
-    retrieval_log = pl.DataFrame([{"itemId": itemId, "userId": userId, "timestamp": timestamp}])
+@router.get("/search/names")
+def search_names(
+    query: str = Query(..., min_length=1),
+    mode: str = Query("prefix", description='"prefix" or "fuzzy"'),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Case-insensitive prefix or fuzzy (trigram) search over item names."""
+    cargo_system = shared_state.read().system
+    if mode == "prefix":
+        matches = [(item_id, None) for item_id in cargo_system.search_index.prefix(query, limit)]
+    elif mode == "fuzzy":
+        matches = cargo_system.search_index.fuzzy(query, limit)
+    else:
+        raise HTTPException(status_code=400, detail="mode must be 'prefix' or 'fuzzy'.")
+
+    items = []
+    for item_id, score in matches:
+        item_data = cargo_system.get_item(item_id)
+        if score is not None:
+            item_data["score"] = score
+        items.append(item_data)
+
+    return {"success": True, "items": items}
+
+
+@router.post("/search/batch")
+def search_batch(request: BatchSearchRequest):
+    """Looks up many itemIds in one request."""
+    cargo_system = shared_state.read().system
+    rows = []
+    not_found = []
+    for item_id in request.itemIds:
+        row = cargo_system.search_index.row(item_id)
+        if row is None:
+            not_found.append(item_id)
+        else:
+            rows.append(row)
+
+    items = cargo_system.items.gather(rows).to_dicts() if rows else []  # One gather for all hits
+    blocker_counts = cargo_system.occlusion_index().blocker_counts([item["itemId"] for item in items])
+    for item, count in zip(items, blocker_counts):
+        item["blockers"] = count  # Items directly in front of it, a proxy for retrieval cost
+    return {"success": True, "items": items, "notFound": not_found}
+
+
+def event_time(timestamp: Optional[str]) -> datetime:
+    """An event's ISO timestamp in UTC (naive ones are taken as UTC); now if missing."""
+    if not timestamp:
+        return datetime.now(timezone.utc)
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp format: '{timestamp}'.")
+    return moment.astimezone(timezone.utc) if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def log_retrievals(events: List[RetrieveEvent], times: List[datetime]):
+    """Keeps retrievals in the action log, where /api/logs and analytics can query them."""
+    details = json.dumps({"fromContainer": "", "toContainer": "", "reason": ""})
+    for event, moment in zip(events, times):
+        action_log.write({
+            "timestamp": moment,
+            "userId": event.userId,
+            "actionType": "retrieval",
+            "itemId": event.itemId,
+            "details": details,
+        })
+
 
+@router.post("/retrieve")
+def retrieve_item(itemId: str, userId: str, timestamp: str):
+    event = RetrieveEvent(itemId=itemId, userId=userId, timestamp=timestamp)
+    moment = event_time(timestamp)
+    with shared_state.write() as state:
+        # Check if the item exists
+        if state.system.search_index.row(itemId) is None:
+            raise HTTPException(status_code=404, detail="Item not found.")
+
+        # Update usage count
+        state.apply("use_item", {"itemId": itemId})
+
+    log_retrievals([event], [moment])
     return {"success": True}
 
 
+@router.post("/retrieve/batch")
+def retrieve_items(request: BatchRetrieveRequest):
+    """Counts many retrievals in one request: one journal entry for all of them."""
+    times = [event_time(event.timestamp) for event in request.events]
+    with shared_state.write() as state:
+        search_index = state.system.search_index
+        found = [search_index.row(event.itemId) is not None for event in request.events]
+        events = [event for event, known in zip(request.events, found) if known]
+        if events:
+            usage_df = (
+                pl.DataFrame({"itemId": [event.itemId for event in events]})
+                .group_by("itemId", maintain_order=True).len(name="uses")
+            )
+            state.apply("add_usage", frame=usage_df)
+
+    log_retrievals(events, [moment for moment, known in zip(times, found) if known])
+    not_found = [event.itemId for event, known in zip(request.events, found) if not known]
+    return {"success": True, "retrieved": len(events), "notFound": not_found}
+
+
 @router.post("/place")
-async def place_item(itemId: str, userId: str, timestamp: str, containerId: str, position: dict):
-    # Check if the item exists
-    result_df = cargo_system.items_df.filter(pl.col("itemId") == itemId)
-    if result_df.is_empty():
-        raise HTTPException(status_code=404, detail="Item not found.")
-
-    # Update the item's position and container
-    cargo_system.items_df = cargo_system.items_df.with_columns(
-        (pl.when(pl.col("itemId") == itemId)
-         .then(containerId)
-         .otherwise(pl.col("containerId"))).alias("containerId"),
-        (pl.when(pl.col("itemId") == itemId)
-         .then(position)
-         .otherwise(pl.col("position"))).alias("position")
-    )
+def place_item(itemId: str, userId: str, timestamp: str, containerId: str, position: dict):
+    with shared_state.write() as state:
+        # Check if the item exists
+        if state.system.search_index.row(itemId) is None:
+            raise HTTPException(status_code=404, detail="Item not found.")
+
+        # Update the item's position and container
+        state.apply("move_item", {"itemId": itemId, "containerId": containerId, "position": position})
 
     return {"success": True}
+
+
+@router.post("/place/batch")
+def place_items(request: BatchPlaceRequest):
+    """Records many hand placements in one request, in order; an item placed twice ends up at the last spot."""
+    with shared_state.write() as state:
+        search_index = state.system.search_index
+        events = [event for event in request.events if search_index.row(event.itemId) is not None]
+        if events:
+            moves_df = pl.DataFrame({
+                "itemId": [event.itemId for event in events],
+                "containerId": [event.containerId for event in events],
+                "position": [json.dumps(event.position) for event in events],
+            }, schema={"itemId": pl.Utf8, "containerId": pl.Utf8, "position": pl.Utf8})
+            state.apply("move_items", frame=moves_df)
+
+    known = {event.itemId for event in events}
+    not_found = [event.itemId for event in request.events if event.itemId not in known]
+    return {"success": True, "placed": len(events), "notFound": not_found}
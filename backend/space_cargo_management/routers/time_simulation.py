@@ -1,78 +1,57 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional, Dict
+import numpy as np
 import polars as pl
 from schemas import TimeSimulationRequest
+from simulation import SimulationEngine
+from state import shared_state
 
 router = APIRouter(
     prefix="/api/simulate",
     tags=["time_simulation"],
 )
 
-# Sample items DataFrame (temporary storage)
-items_df = pl.DataFrame({
-    "itemId": [],
-    "name": [],
-    "remainingUses": [],
-    "expiryDate": []
-})
-
-# Global variable to track simulated date
-current_date = datetime.now(timezone.utc)
 
 @router.post("/day")
-async def simulate_day(request: TimeSimulationRequest):
-    global current_date, items_df
-
-    # Determine the new date
-    if request.toTimestamp:
-        try:
-            new_date = datetime.fromisoformat(request.toTimestamp)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid timestamp format.")
-    elif request.numOfDays is not None:
-        new_date = current_date + timedelta(days=request.numOfDays)
-    else:
-        raise HTTPException(status_code=400, detail="Provide either numOfDays or toTimestamp.")
-
-    # Lists to store changes
-    items_used = []
-    items_expired = []
-    items_depleted_today = []
-
-    # Process items used per day
-    for item_usage in request.itemsToBeUsedPerDay:
-        item_id = item_usage.get("itemId")
-        item_name = item_usage.get("name")
-
-        # Find the item in the DataFrame
-        filtered_items = items_df.filter(
-            (items_df["itemId"] == item_id) | (items_df["name"] == item_name)
-        )
-
-        if not filtered_items.is_empty():
-            for item in filtered_items.to_dicts():
-                item["remainingUses"] -= 1  # Reduce remaining uses
-                if item["remainingUses"] <= 0:
-                    items_depleted_today.append({"itemId": item["itemId"], "name": item["name"]})
-        
-                items_used.append({"itemId": item["itemId"], "name": item["name"], "remainingUses": max(0, item["remainingUses"])})
-
-    # Check for expired items
-    expired_items = items_df.filter(pl.col("expiryDate") <= new_date.isoformat()).to_dicts()
-    for item in expired_items:
-        items_expired.append({"itemId": item["itemId"], "name": item["name"]})
-
-    # Update current date
-    current_date = new_date
-
-    return {
+def simulate_day(request: TimeSimulationRequest):
+    # Read, simulate and move the date as one change so concurrent requests don't lose days
+    with shared_state.write() as state:
+        current_date = state.current_date
+
+        # Determine the new date
+        if request.toTimestamp:
+            try:
+                new_date = datetime.fromisoformat(request.toTimestamp)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid timestamp format.")
+            if new_date.tzinfo is None:
+                new_date = new_date.replace(tzinfo=timezone.utc)
+            days = (new_date.date() - current_date.date()).days
+        elif request.numOfDays is not None:
+            new_date = current_date + timedelta(days=request.numOfDays)
+            days = request.numOfDays
+        else:
+            raise HTTPException(status_code=400, detail="Provide either numOfDays or toTimestamp.")
+
+        items_df = state.system.items_df
+        result = SimulationEngine(items_df, current_date).advance(days, request.itemsToBeUsedPerDay, request.perDay)
+
+        # Store the uses and move the date
+        uses = result["uses"]
+        if uses.any():
+            used_rows = np.flatnonzero(uses)
+            usage_df = pl.DataFrame({
+                "itemId": items_df["itemId"].cast(pl.Utf8).gather(used_rows),
+                "uses": uses[used_rows],
+            })
+            state.apply("add_usage", frame=usage_df)
+        state.apply("set_date", {"date": new_date.isoformat()})
+
+    response = {
         "success": True,
         "newDate": new_date.isoformat(),
-        "changes": {
-            "itemsUsed": items_used,
-            "itemsExpired": items_expired,
-            "itemsDepletedToday": items_depleted_today
-        }
+        "changes": result["changes"],
     }
+    if request.perDay:
+        response["days"] = result["days"]
+    return response
@@ -1,35 +1,43 @@
-from fastapi import APIRouter, HTTPException
+import json
+from datetime import date
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict
 import polars as pl
 from pydantic import BaseModel
+import config
+from return_planner import plan_return
+from state import shared_state
 
 router = APIRouter(
     prefix="/api/waste",
     tags=["waste"],
 )
 
-# Sample waste items DataFrame (temporary storage)
-waste_items_df = pl.DataFrame({
-    "itemId": [],
-    "name": [],
-    "reason": [],
-    "containerId": [],
-    "position": []
-})
 
-# Sample return plans storage
-return_plans = []
-completed_undocking = {}
+def waste_records(waste_items_df: pl.DataFrame) -> List[dict]:
+    """Waste rows as response dicts with the position decoded."""
+    waste_items = waste_items_df.to_dicts()
+    for item in waste_items:
+        item["position"] = json.loads(item["position"]) if item["position"] else None
+    return waste_items
 
 
 # Identify Waste Items
 @router.get("/identify")
-async def identify_waste():
+def identify_waste():
+    waste_items_df = shared_state.read().waste_items_df
     if waste_items_df.is_empty():
         return {"success": False, "wasteItems": []}
 
-    waste_items = waste_items_df.to_dicts()
-    return {"success": True, "wasteItems": waste_items}
+    return {"success": True, "wasteItems": waste_records(waste_items_df)}
+
+
+# Items that will expire before a given date, straight from the waste index
+@router.get("/upcoming")
+def upcoming_waste(before: date = Query(..., description="YYYY-MM-DD")):
+    state = shared_state.read()
+    upcoming_df = state.system.waste_between(state.current_date.date(), before)
+    return {"success": True, "wasteItems": waste_records(upcoming_df)}
 
 
 # Return Plan Calculation
@@ -37,38 +45,71 @@ class ReturnPlanRequest(BaseModel):
     undockingContainerId: str
     undockingDate: str
     maxWeight: float
+    objective: str = "volume"  # Maximize the "volume" freed or the total "priority" returned
 
 @router.post("/return-plan")
-async def generate_return_plan(request: ReturnPlanRequest):
-    global return_plans
+def generate_return_plan(request: ReturnPlanRequest):
+    if request.objective not in ("volume", "priority"):
+        raise HTTPException(status_code=400, detail="objective must be 'volume' or 'priority'.")
+
+    state = shared_state.read()
+    system = state.system
+    waste_items_df = state.waste_items_df
 
     if waste_items_df.is_empty():
         raise HTTPException(status_code=404, detail="No waste items found.")
 
-    return_items = waste_items_df.filter(waste_items_df["containerId"] == request.undockingContainerId).to_dicts()
-    if not return_items:
-        raise HTTPException(status_code=404, detail="No waste items in this container.")
+    # Size, mass and priority of every waste item; a missing mass counts as zero
+    rows = [system.search_index.row(item_id) for item_id in waste_items_df["itemId"].to_list()]
+    candidates_df = system.items.manifest[rows].select(
+        (pl.col("width") * pl.col("depth") * pl.col("height")).cast(pl.Float64).alias("volume"),
+        (pl.col("mass") if "mass" in system.items.manifest.columns else pl.lit(0.0)).cast(pl.Float64).fill_null(0.0).alias("mass"),
+        pl.col("priority").cast(pl.Float64).alias("priority"),
+    )
+
+    # The undocking container's own capacity limits the volume
+    undocking_df = system.containers_df.filter(
+        pl.col("containerId").cast(pl.Utf8) == request.undockingContainerId
+    ) if not system.containers_df.is_empty() else system.containers_df
+    max_volume = None
+    if not undocking_df.is_empty():
+        container = undocking_df.row(0, named=True)
+        max_volume = float(container["width"] * container["depth"] * container["height"])
+
+    plan = plan_return(
+        candidates_df[request.objective].to_numpy(),
+        candidates_df["mass"].to_numpy(),
+        candidates_df["volume"].to_numpy(),
+        request.maxWeight,
+        max_volume,
+        time_limit=config.RETURN_PLAN_TIME_LIMIT,
+    )
+    selected = plan.selected.tolist()
+    return_items = waste_items_df[selected].to_dicts()
+    chosen_df = candidates_df[selected]
 
     return_manifest = {
         "undockingContainerId": request.undockingContainerId,
         "undockingDate": request.undockingDate,
         "returnItems": [{"itemId": item["itemId"], "name": item["name"], "reason": item["reason"]} for item in return_items],
-        "totalVolume": len(return_items) * 0.5,  # Example calculation
-        "totalWeight": min(request.maxWeight, len(return_items) * 2)  # Example calculation
+        "totalVolume": float(chosen_df["volume"].sum()),
+        "totalWeight": float(chosen_df["mass"].sum()),
     }
 
     return_plan = [{"step": i+1, "itemId": item["itemId"], "itemName": item["name"], 
-                    "fromContainer": item["containerId"], "toContainer": "Return Zone"} for i, item in enumerate(return_items)]
+                    "fromContainer": item["containerId"], "toContainer": request.undockingContainerId} for i, item in enumerate(return_items)]
     
     retrieval_steps = [{"step": i+1, "action": "remove", "itemId": item["itemId"], "itemName": item["name"]} for i, item in enumerate(return_items)]
 
-    return_plans.append(return_manifest)
+    with shared_state.write() as state:
+        state.apply("add_return_plan", {"manifest": return_manifest})
     
     return {
         "success": True,
         "returnPlan": return_plan,
         "retrievalSteps": retrieval_steps,
-        "returnManifest": return_manifest
+        "returnManifest": return_manifest,
+        "optimality": plan.report(),
     }
 
 
@@ -78,15 +119,16 @@ class CompleteUndockingRequest(BaseModel):
     timestamp: str
 
 @router.post("/complete-undocking")
-async def complete_undocking(request: CompleteUndockingRequest):
-    global completed_undocking
-
-    if request.undockingContainerId not in [plan["undockingContainerId"] for plan in return_plans]:
-        raise HTTPException(status_code=404, detail="Return plan not found for this container.")
-
-    completed_undocking[request.undockingContainerId] = {
-        "timestamp": request.timestamp,
-        "itemsRemoved": len([item for item in waste_items_df.to_dicts() if item["containerId"] == request.undockingContainerId])
-    }
-
-    return {"success": True, "itemsRemoved": completed_undocking[request.undockingContainerId]["itemsRemoved"]}
+def complete_undocking(request: CompleteUndockingRequest):
+    with shared_state.write() as state:
+        if request.undockingContainerId not in [plan["undockingContainerId"] for plan in state.return_plans]:
+            raise HTTPException(status_code=404, detail="Return plan not found for this container.")
+
+        manifest = [plan for plan in state.return_plans if plan["undockingContainerId"] == request.undockingContainerId][-1]
+        record = {
+            "timestamp": request.timestamp,
+            "itemsRemoved": len(manifest["returnItems"])
+        }
+        state.apply("complete_undocking", {"containerId": request.undockingContainerId, "record": record})
+
+    return {"success": True, "itemsRemoved": record["itemsRemoved"]}
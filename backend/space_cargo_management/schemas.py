@@ -1,7 +1,24 @@
+import copy
+import heapq
+import json
+import multiprocessing
+import time
+import numpy as np
 import polars as pl
+from concurrent.futures import ProcessPoolExecutor
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Union
 from datetime import date
+from itertools import repeat
+from voxel_grid import VoxelGrid
+from packing import ExtremePointPacker
+from placement_builder import COORDINATE_COLUMNS, PlacementBuilder
+from item_store import ItemStore
+from search_index import ItemSearchIndex
+from waste_index import WasteIndex
+from occlusion import OcclusionIndex
+from rearrangement import RearrangementPlanner
+from metrics import metrics
 
 class Octant:
     """Represents a node (octant) in the Octree."""
@@ -42,15 +59,17 @@ class Octant:
         """Tries to place an item into the octree."""
         if self.is_fitting(item_row):
             self.occupied = True
-            return pl.DataFrame({
-                "start_x": [self.x], "start_y": [self.y], "start_z": [self.z],
-                "end_x": [self.x + item_row["width"]],
-                "end_y": [self.y + item_row["depth"]],
-                "end_z": [self.z + item_row["height"]]
-            })  # Returns a DataFrame with placement coordinates
+            return (
+                self.x, self.y, self.z,
+                self.x + item_row["width"],
+                self.y + item_row["depth"],
+                self.z + item_row["height"]
+            )  # Returns the placement coordinates (start_x, start_y, start_z, end_x, end_y, end_z)
 
         if not self.children:
             self.subdivide()
+            if not self.children:
+                return None  # Reached max_level, cannot split further
 
         for child in self.children:
             result = child.place_item(item_row)
@@ -64,12 +83,24 @@ class Octree:
     """Octree structure for managing storage placement."""
     def __init__(self, container_row):
         self.root = Octant(
-            0, 0, 0, container_row["width"], container_row["depth"], container_row["height"]
+            0.0, 0.0, 0.0, container_row["width"], container_row["depth"], container_row["height"]
         )
 
     def place_item(self, item_row):
         """Finds the best space for an item and places it."""
-        return self.root.place_item(item_row)  # Returns DataFrame if placed, None otherwise
+        return self.root.place_item(item_row)  # Returns coordinates if placed, None otherwise
+
+    def reserve(self, position):
+        """Marks an already decided placement (start_x, ..., end_z) as used.
+
+        Octants are taken first-fit in a fixed order, so placing boxes of the
+        same sizes in their original order lands each in its original octant.
+        """
+        self.root.place_item({
+            "width": position[3] - position[0],
+            "depth": position[4] - position[1],
+            "height": position[5] - position[2],
+        })
 
 class Coordinates(BaseModel):
     width: float
@@ -112,89 +143,619 @@ class Container(BaseModel):
 class PlacementRequest(BaseModel):
     items: List[Item]
     containers: List[Container]
+    incremental: bool = False  # Only place these items on top of the stored placements
+    rearrangementTimeBudget: Optional[float] = None  # Seconds to search for moves; None uses the server default
+    timeBudget: Optional[float] = None  # Seconds the whole run may take; None for no limit
 
 class PlacementResponse(BaseModel):
     success: bool
     placements: List[ItemPlacement]
     rearrangements: List[RearrangementStep]
+    timedOut: bool = False  # The time budget ran out; unplaced items stay queued
 
 # ---------------- Cargo Placement System ----------------
 
+# Placement indexes selectable per CargoPlacementSystem, keyed by engine name.
+# Each one is built from a container row and exposes place_item(item_row), which
+# returns (start_x, start_y, start_z, end_x, end_y, end_z) or None.
+PLACEMENT_ENGINES = {
+    "octree": Octree,
+    "voxel": VoxelGrid,
+    "extreme_point": ExtremePointPacker,
+}
+
+# Columns of the persistent placement state and of every placements frame
+PLACEMENT_SCHEMA = {
+    "itemId": pl.Utf8,
+    "zone": pl.Utf8,
+    "start_x": pl.Float64, "start_y": pl.Float64, "start_z": pl.Float64,
+    "end_x": pl.Float64, "end_y": pl.Float64, "end_z": pl.Float64,
+}
+
+def replace_placements(placements_df: pl.DataFrame, changed_df: pl.DataFrame) -> pl.DataFrame:
+    """``placements_df`` with the rows of items in ``changed_df`` replaced by (or added from) it."""
+    kept_df = placements_df.filter(~pl.col("itemId").is_in(changed_df["itemId"].implode()))
+    return pl.concat([kept_df, changed_df], rechunk=False)
+
+
+# Items between progress reports while a zone is packed on the calling thread
+PROGRESS_EVERY = 256
+
+
+def place_zone_items(zone: str, index, items_df: pl.DataFrame, progress: Optional[Callable[[int], None]] = None):
+    """Places one zone's items, already in priority order, into its placement index.
+
+    Module-level so process pool workers can run it. The index is returned
+    as well because a worker fills its own copy, and so is the time taken,
+    since a worker can't record it itself. ``progress`` is called with the
+    number of items handled so far every PROGRESS_EVERY items.
+    """
+    started = time.perf_counter()
+    placements = PlacementBuilder(capacity=items_df.height)
+    unplaced = []
+
+    for count, item_row in enumerate(items_df.iter_rows(named=True)):
+        if progress is not None and count and count % PROGRESS_EVERY == 0:
+            progress(count)
+        placement_position = index.place_item(item_row)
+
+        if placement_position is not None:
+            placements.append(item_row["itemId"], zone, placement_position)  # Store zone instead of containerId
+        else:
+            unplaced.append(item_row["itemId"])
+
+    return zone, index, placements.build(), unplaced, time.perf_counter() - started
+
+
+def place_by_priority(zone_batches, deadline: float, progress: Optional[Callable[[int, int], None]] = None):
+    """Places the items of several zones in one priority order across zones until ``deadline``.
+
+    Zones don't share items, so each index sees its items in the same order
+    as with place_zone_items; stopping at the deadline (a perf_counter
+    value) leaves the most important items of the whole queue placed. The
+    first item is tried even if the deadline has already passed.
+    Returns the per-zone results of place_zone_items and the itemIds that
+    were not tried in time.
+    """
+    indexes = {zone: index for zone, index, _ in zone_batches}
+    placements = {zone: PlacementBuilder(capacity=items_df.height) for zone, _, items_df in zone_batches}
+    unplaced = {zone: [] for zone in indexes}
+    seconds = dict.fromkeys(indexes, 0.0)
+    total = sum(items_df.height for _, _, items_df in zone_batches)
+
+    rows = heapq.merge(
+        *[zip(repeat(zone), items_df.iter_rows(named=True)) for zone, _, items_df in zone_batches],
+        key=lambda entry: -entry[1]["priority"],
+    )
+    not_tried = []
+    for count, (zone, item_row) in enumerate(rows):
+        started = time.perf_counter()
+        if count and started > deadline:  # The most important item is always tried
+            not_tried = [item_row["itemId"]] + [row["itemId"] for _, row in rows]
+            break
+        if progress is not None and count and count % PROGRESS_EVERY == 0:
+            progress(count, total)
+
+        placement_position = indexes[zone].place_item(item_row)
+        if placement_position is not None:
+            placements[zone].append(item_row["itemId"], zone, placement_position)
+        else:
+            unplaced[zone].append(item_row["itemId"])
+        seconds[zone] += time.perf_counter() - started
+
+    results = [(zone, indexes[zone], placements[zone].build(), unplaced[zone], seconds[zone]) for zone in indexes]
+    return results, not_tried
+
+
+def optimize_snapshot(system: "CargoPlacementSystem", incremental: bool, rearrangement_budget: float,
+                      time_budget: Optional[float] = None, progress: Optional[Callable[[int, int], None]] = None):
+    """Runs optimize_placement on a snapshot; returns the snapshot, now packed, and the result.
+
+    Module-level so a job can run it in another process, which packs the
+    copy of the snapshot it was sent. The result comes back as a dict of
+    columns (``pl.DataFrame`` of it gives the usual frame), since Polars
+    can't pickle the frames nested in its object columns.
+    """
+    result = system.optimize_placement(incremental=incremental, rearrangement_budget=rearrangement_budget,
+                                       time_budget=time_budget, progress=progress)
+    return system, result.to_dict(as_series=False)
+
+
 class CargoPlacementSystem:
-    def __init__(self):
-        self.items_df = pl.DataFrame()
+    def __init__(self, engine: str = "octree", workers: int = 1):
+        if engine not in PLACEMENT_ENGINES:
+            raise ValueError(f"Unknown placement engine '{engine}'. Choose from {list(PLACEMENT_ENGINES)}.")
+        self.engine = engine
+
+        # Zones are packed independently; with more than one worker they run on a process pool
+        self.workers = max(1, workers)
+        self._pool = None
+
+        self.items = ItemStore()  # Manifest plus usage counts and hand-set locations, updated in place
         self.containers_df = pl.DataFrame()
+        self.search_index = ItemSearchIndex()  # itemId -> row of the item store, kept in step with it
+        self.waste_index = WasteIndex()  # Likewise
+
+        # Placement indexes keyed by (trimmed) zone instead of containerId,
+        # with the container row each one was built from
+        self.octrees = {}
+        self.zone_containers = {}
+
+        # Persistent placement state: everything placed so far, plus the item
+        # frames that arrived since and still wait for a spot
+        self.placements_df = pl.DataFrame(schema=PLACEMENT_SCHEMA)
+        self.placed_item_ids = set()
+        self.pending_items = []
+        self._occlusion = None  # OcclusionIndex over placements_df, built on demand
+
+        # Zones whose index lags behind placements_df (placements applied from elsewhere);
+        # their indexes are rebuilt from the placements before the next incremental run
+        self._stale_zones = set()
+        self._occlusion_source = None
+
+    def add_items(self, items: Union[List[dict], pl.DataFrame], append: bool = False):
+        """Store items (dicts or an already built frame) in a Polars DataFrame.
+
+        By default the items replace the manifest and all placement state is
+        reset. With ``append=True`` they are merged into the manifest (same
+        itemId replaces the old row) and queued for the next incremental run.
+        """
+        new_df = pl.DataFrame(items)
 
-        # Modify octree storage to use `zone` instead of `containerId`
-        self.octrees = pl.DataFrame({
-            "zone": [],
-            "octree": []
-        })
+        if not append or self.items.is_empty():
+            self.items.reset(new_df)
+            self.search_index.rebuild(new_df)
+            self.waste_index.rebuild(new_df)
+            self.reset_placements()
+            self.pending_items = [new_df]
+            return
 
-    def add_items(self, items: List[dict]):
-        """Store items in a Polars DataFrame."""
-        self.items_df = pl.DataFrame(items)
+        replaced = self.items.manifest["itemId"].is_in(new_df["itemId"].implode())
+        if replaced.any():
+            items_df = self.items_df
+            self.items.reset(pl.concat([items_df.filter(~replaced), new_df], how="diagonal_relaxed", rechunk=False))
+            self.search_index.rebuild(self.items.manifest)  # Rows moved, so reindex
+            self.waste_index.rebuild(self.items_df)
+        else:
+            offset = self.items.height
+            self.items.append(new_df)
+            self.search_index.extend(new_df, offset)
+            self.waste_index.extend(new_df, offset)
+        self.pending_items.append(new_df)
+
+    @property
+    def items_df(self) -> pl.DataFrame:
+        """Every item with its current usage count and location, as one frame.
+
+        Rebuilt from the item store after a change, so prefer ``get_item`` or
+        ``items.gather`` for a few rows.
+        """
+        return self.items.frame()
+
+    def get_item(self, item_id) -> Optional[dict]:
+        """Returns an item row by itemId through the search index, or None."""
+        row = self.search_index.row(item_id)
+        return None if row is None else self.items.row(row)
 
     def add_containers(self, containers: List[dict]):
-        """Store containers and initialize Octrees using zone."""
-        self.containers_df = pl.DataFrame(containers)
-
-        print("=== Containers DataFrame ===")
-        print(self.containers_df)
+        """Store containers and initialize placement indexes using zone.
 
-        # Keep existing container import code
-        self.octrees = {}  # Store octrees separately in a dictionary
+        Indexes of zones whose container is unchanged keep their state; items
+        placed in zones that were removed or resized are queued again.
+        """
+        self.containers_df = pl.DataFrame(containers)
 
-        # Initialize octrees using the zone instead of containerId
+        zone_containers = {}
         for container in self.containers_df.iter_rows(named=True):
-            zone = container["zone"]  # Use zone as the key
-            self.octrees[zone] = Octree(container)  # Create and store the octree
+            zone_containers[container["zone"].strip()] = container  # Use trimmed zone as the key
+
+        octrees = {}
+        for zone, container in zone_containers.items():
+            previous = self.zone_containers.get(zone)
+            if previous is not None and zone in self.octrees and all(
+                previous[dim] == container[dim] for dim in ("width", "depth", "height")
+            ):
+                octrees[zone] = self.octrees[zone]
+            else:
+                octrees[zone] = PLACEMENT_ENGINES[self.engine](container)  # Create and store the placement index
+
+        kept_zones = [zone for zone in octrees if octrees[zone] is self.octrees.get(zone)]
+        self._stale_zones.intersection_update(kept_zones)
+        self.octrees = octrees
+        self.zone_containers = zone_containers
+
+        stale_df = self.placements_df.filter(~pl.col("zone").is_in(kept_zones))
+        if not stale_df.is_empty():
+            self.placements_df = self.placements_df.filter(pl.col("zone").is_in(kept_zones))
+            self.placed_item_ids.difference_update(stale_df["itemId"].to_list())
+            self.pending_items.append(self.items_df.filter(pl.col("itemId").is_in(stale_df["itemId"].implode())))
+
+    def occlusion_index(self) -> OcclusionIndex:
+        """Occlusion index of the current placements, rebuilt only after they change."""
+        if self._occlusion is None or self._occlusion_source is not self.placements_df:
+            self._occlusion = OcclusionIndex(self.placements_df)
+            self._occlusion_source = self.placements_df  # Frames are immutable, so identity marks a change
+        return self._occlusion
+
+    def reset_placements(self):
+        """Forget every placement and start each zone from an empty index."""
+        self.octrees = {zone: PLACEMENT_ENGINES[self.engine](container) for zone, container in self.zone_containers.items()}
+        self.placements_df = pl.DataFrame(schema=PLACEMENT_SCHEMA)
+        self.placed_item_ids = set()
+        self.pending_items = []
+        self._stale_zones = set()
+
+    def snapshot(self, indexes: bool = True) -> "CargoPlacementSystem":
+        """Copy that can be packed while this system keeps serving reads.
+
+        Frames are immutable and shared with the copy; the containers that
+        change in place are copied. The zone indexes are copied only with
+        ``indexes`` (incremental runs), since a full run replaces them.
+        """
+        clone = copy.copy(self)
+        clone.items = self.items.copy()
+        clone.search_index = copy.copy(self.search_index)
+        clone.search_index.rows = dict(self.search_index.rows)  # Extended in place by add_items
+        clone.octrees = copy.deepcopy(self.octrees) if indexes else dict(self.octrees)
+        clone.placed_item_ids = set(self.placed_item_ids)
+        clone.pending_items = list(self.pending_items)
+        clone._stale_zones = set(self._stale_zones)
+        return clone
+
+    def adopt_placements(self, packed: "CargoPlacementSystem"):
+        """Takes over the placement state of a snapshot packed from this system's current state."""
+        self.octrees = packed.octrees
+        self.placements_df = packed.placements_df
+        self.placed_item_ids = packed.placed_item_ids
+        self.pending_items = packed.pending_items
+        self._stale_zones = packed._stale_zones
+
+    def __getstate__(self):
+        # A copy sent to another process packs there on its own, without this process's pool
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["workers"] = 1
+        return state
+
+    def apply_placements(self, placements_df: pl.DataFrame, reset: bool = False):
+        """Adopts placements decided by another process, as returned by optimize_placement.
+
+        ``reset`` marks the result of a full run. Only the placement state is
+        updated here; the affected zone indexes are rebuilt lazily.
+        """
+        if reset:
+            self.reset_placements()
+            self._stale_zones = set(self.octrees)
+        if not placements_df.is_empty():
+            moved = self.placed_item_ids.intersection(placements_df["itemId"].to_list())
+            if moved:
+                # Items moved by a rearrangement: the zones they left change as well
+                moved_df = self.placements_df.filter(pl.col("itemId").is_in(list(moved)))
+                self._stale_zones.update(zone for zone in moved_df["zone"].unique().to_list() if zone in self.octrees)
+            self.placements_df = replace_placements(self.placements_df, placements_df)
+            self.placed_item_ids.update(placements_df["itemId"].to_list())
+            self._stale_zones.update(zone for zone in placements_df["zone"].unique().to_list() if zone in self.octrees)
+
+        # Like after a run of our own: whatever is not placed waits for the next one
+        if self.items.is_empty():
+            self.pending_items = []
+            return
+        placed = pl.Series(list(self.placed_item_ids), dtype=pl.Utf8)  # Placement frames hold string ids
+        unplaced_df = self.items.manifest.filter(~pl.col("itemId").cast(pl.Utf8).is_in(placed.implode()))
+        self.pending_items = [unplaced_df] if not unplaced_df.is_empty() else []
+
+    def _restore_indexes(self):
+        """Rebuilds stale zone indexes by reserving their placements in placement order."""
+        for zone in self._stale_zones:
+            self.octrees[zone] = self.build_index(zone, self.placements_df.filter(pl.col("zone") == zone))
+        self._stale_zones = set()
+
+    def build_index(self, zone: str, zone_df: pl.DataFrame):
+        """A fresh index for ``zone`` holding the placements of ``zone_df``, in their order."""
+        index = PLACEMENT_ENGINES[self.engine](self.zone_containers[zone])
+        if hasattr(index, "min_size") and not zone_df.is_empty():
+            index.min_size = float(zone_df.select(pl.min_horizontal(
+                pl.col("end_x") - pl.col("start_x"),
+                pl.col("end_y") - pl.col("start_y"),
+                pl.col("end_z") - pl.col("start_z"),
+            ).min()).item())
+        for position in zone_df.select(COORDINATE_COLUMNS).iter_rows():
+            index.reserve(position)
+        return index
+
+    def use_item(self, item_id):
+        """Counts one use of an item."""
+        row = self.search_index.row(item_id)
+        self.items.use([row], [1])
+        self._update_waste([row])
+
+    def add_usage(self, usage_df: pl.DataFrame):
+        """Adds ``uses`` to the usageCount of each listed itemId."""
+        rows, counts = [], []
+        for item_id, count in usage_df.select("itemId", "uses").iter_rows():
+            row = self.search_index.row(item_id)
+            if row is not None:
+                rows.append(row)
+                counts.append(count)
+        self.items.use(rows, counts)
+        self._update_waste(sorted(set(rows)))
+
+    def _update_waste(self, rows: List[int]):
+        """Feeds the new usage counts of ``rows`` to the waste index."""
+        self.waste_index.update_usage(
+            rows, pl.Series(self.items.usage[rows], dtype=pl.Int64), self.items.manifest["usageLimit"].gather(rows)
+        )
 
-        print("=== Initialized Octrees ===")
-        print(self.octrees)
+    def waste_items(self, on: date) -> pl.DataFrame:
+        """Items that are waste on ``on``: expired, or used up."""
+        waste = self.waste_index.waste(on)
+        return self._waste_frame([row for row, _ in waste], [reason for _, reason in waste])
+
+    def waste_between(self, after: date, before: date) -> pl.DataFrame:
+        """Items that expire after ``after`` and before ``before``."""
+        rows = self.waste_index.expiring(after, before).tolist()
+        return self._waste_frame(rows, ["Expired"] * len(rows))
+
+    def _waste_frame(self, rows: List[int], reasons: List[str]) -> pl.DataFrame:
+        """Waste rows with where each item is: a spot set by hand, else its placement."""
+        if not rows:
+            return pl.DataFrame(schema={"itemId": pl.Utf8, "name": pl.Utf8, "reason": pl.Utf8,
+                                        "containerId": pl.Utf8, "position": pl.Utf8})
+
+        items_df = self.items.gather(rows)
+        occlusion = self.occlusion_index()  # Cached itemId -> placement lookup
+        containers, positions = [], []
+        for item in items_df.select(pl.col("itemId").cast(pl.Utf8), "containerId", "position").iter_rows(named=True):
+            location = occlusion.locations.get(item["itemId"])
+            if item["containerId"] is not None:
+                containers.append(item["containerId"])
+                positions.append(item["position"])
+            elif location is not None:
+                zone, row = location
+                box = occlusion.zones[zone][1][row]
+                containers.append(str(self.zone_containers[zone]["containerId"]) if zone in self.zone_containers else None)
+                positions.append(json.dumps({
+                    "startCoordinates": {"width": box[0], "depth": box[1], "height": box[2]},
+                    "endCoordinates": {"width": box[3], "depth": box[4], "height": box[5]},
+                }))
+            else:
+                containers.append(None)
+                positions.append(None)
 
+        return pl.DataFrame({
+            "itemId": items_df["itemId"].cast(pl.Utf8),
+            "name": items_df["name"].cast(pl.Utf8),
+            "reason": pl.Series(reasons, dtype=pl.Utf8),
+            "containerId": pl.Series(containers, dtype=pl.Utf8),
+            "position": pl.Series(positions, dtype=pl.Utf8),
+        })
 
-    def optimize_placement(self):
-        """Places items using Octree, now indexed by zone instead of containerId."""
-        placements_df = pl.DataFrame()
+    def move_item(self, item_id, container_id: str, position: dict):
+        """Records where an item was put by hand; the position is kept as JSON text."""
+        self.items.move(self.search_index.row(item_id), str(container_id), json.dumps(position))
+
+    def move_items(self, moves_df: pl.DataFrame):
+        """Applies hand placements in order from itemId, containerId and position (JSON text) columns."""
+        for item_id, container_id, position in moves_df.select("itemId", "containerId", "position").iter_rows():
+            row = self.search_index.row(item_id)
+            if row is not None:
+                self.items.move(row, str(container_id), position)
+
+    def optimize_placement(self, incremental: bool = False, rearrangement_budget: float = 0.0,
+                           time_budget: Optional[float] = None,
+                           progress: Optional[Callable[[int, int], None]] = None):
+        """Places items using the zone placement indexes.
+
+        A full run (the default) starts from empty indexes and places the
+        whole manifest, so repeated calls give the same result. An
+        incremental run keeps the current placements and only places items
+        added since the last run; it returns just those new placements.
+
+        With a ``rearrangement_budget`` (seconds), items that find no spot
+        may move lower-priority items to other zones; the moves are returned
+        as rearrangements and the moved items' new spots as placements.
+
+        With a ``time_budget`` (seconds), items are placed in one priority
+        order across zones until the budget runs out, and time left after
+        that goes to rearrangement; items not tried stay queued like
+        unplaced ones; the most important item is always tried, even with a
+        budget of 0. ``timedOut`` in the result tells whether the budget cut
+        the run short, ``rearrangementTimedOut`` whether the rearrangement
+        planner ran out of its own budget with items still unplaced.
+
+        ``progress`` is called with (items handled, items to place) while
+        zones are packed; an exception it raises abandons the run.
+        """
+        deadline = None if time_budget is None else time.perf_counter() + max(0.0, time_budget)
         rearrangements_df = pl.DataFrame()
 
         if self.items_df.is_empty() or self.containers_df.is_empty():
-            print("Error: No items or containers available.")
-            return pl.DataFrame({"success": [False], "placements": [None], "rearrangements": [None]})
-
-        sorted_items_df = self.items_df.sort("priority", descending=True)
-
-        for item_row in sorted_items_df.iter_rows(named=True):
-            preferred_zone = item_row["preferredZone"].strip()  # Ensure no leading/trailing spaces
-
-            # Ensure stored octrees also have trimmed keys
-            self.octrees = {zone.strip(): octree for zone, octree in self.octrees.items()}  
-
-            octree = self.octrees.get(preferred_zone)  # Lookup with trimmed zone
-
-            if octree is None:
-                print(f"Warning: No octree found for zone '{preferred_zone}'")
-                continue
-
-            placement_position = octree.place_item(item_row)
-
-            if placement_position is not None:
-                placement_record = pl.DataFrame({
-                    "itemId": [item_row["itemId"]],
-                    "zone": [preferred_zone],  # Store zone instead of containerId
-                }).hstack(placement_position)
-
-                placements_df = placements_df.vstack(placement_record) if not placements_df.is_empty() else placement_record
+            return pl.DataFrame({"success": [False], "placements": [None], "rearrangements": [None],
+                                 "utilization": [None], "timedOut": [False], "rearrangementTimedOut": [False]})
+
+        if incremental:
+            self._restore_indexes()
+            pending_df = pl.concat(self.pending_items, how="diagonal_relaxed") if self.pending_items else self.items_df.clear()
+            pending_df = pending_df.unique(subset="itemId", keep="last", maintain_order=True)
+            pending_df = pending_df.filter(
+                pl.Series([item_id not in self.placed_item_ids for item_id in pending_df["itemId"]], dtype=pl.Boolean)
+            )
+        else:
+            self.reset_placements()
+            pending_df = self.items_df
+
+        with metrics.span("placement.sort"):
+            sorted_items_df = pending_df.sort("priority", descending=True)
+
+            # Packers that track free spaces can drop slivers thinner than the smallest item side.
+            # Indexes that already hold placements keep the smallest bound they have seen.
+            if not sorted_items_df.is_empty():
+                smallest_side = float(sorted_items_df.select(pl.min_horizontal("width", "depth", "height").min()).item())
+                for index in self.octrees.values():
+                    if hasattr(index, "min_size"):
+                        index.min_size = min(index.min_size, smallest_side) if incremental else smallest_side
+
+            # Items only ever go to their preferred zone, so each zone is packed on its own
+            zone_batches = []
+            unplaced = []
+            for zone_items_df in sorted_items_df.with_columns(
+                pl.col("preferredZone").str.strip_chars().alias("_zone")  # Ensure no leading/trailing spaces
+            ).partition_by("_zone", maintain_order=True):
+                preferred_zone = zone_items_df["_zone"][0]
+                octree = self.octrees.get(preferred_zone)  # Lookup with trimmed zone
+
+                if octree is None:
+                    # No container for this zone
+                    metrics.count("placement.unknown_zone_items", zone_items_df.height)
+                    unplaced.extend(zone_items_df["itemId"].to_list())
+                    continue
+
+                zone_batches.append((preferred_zone, octree, zone_items_df.drop("_zone")))
+
+        with metrics.span("placement.pack"):
+            total = sum(batch[2].height for batch in zone_batches)
+            done = 0
+            results = []
+            not_tried = []
+            if deadline is not None:
+                # On this thread, so what gets placed in time is the most important part of the queue
+                results, not_tried = place_by_priority(zone_batches, deadline, progress)
+            elif self.workers > 1 and len(zone_batches) > 1:
+                results_in_order = self._get_pool().map(place_zone_items, *zip(*zone_batches))
+                for batch, result in zip(zone_batches, results_in_order):
+                    results.append(result)
+                    done += batch[2].height
+                    if progress is not None:
+                        progress(done, total)
             else:
-                print(f"Failed to place item {item_row['itemId']} in zone {preferred_zone}")
+                for zone, index, zone_items_df in zone_batches:
+                    zone_progress = None
+                    if progress is not None:
+                        zone_progress = lambda count, offset=done: progress(offset + count, total)
+                    results.append(place_zone_items(zone, index, zone_items_df, zone_progress))
+                    done += zone_items_df.height
+                    if progress is not None:
+                        progress(done, total)
+
+        with metrics.span("placement.assemble"):
+            zone_placements = []
+            for zone, octree, zone_placements_df, zone_unplaced, seconds in results:
+                self.octrees[zone] = octree  # Workers return the index they filled
+                zone_placements.append(zone_placements_df)
+                unplaced.extend(zone_unplaced)
+                metrics.observe_span("placement.pack_zone", seconds)
+                metrics.count("placement.no_space_items", len(zone_unplaced))
+            placements_df = pl.concat(zone_placements) if zone_placements else pl.DataFrame(schema=PLACEMENT_SCHEMA)
+
+            # Record the new placements; items that found no spot stay queued for a later run
+            if not placements_df.is_empty():
+                self.placements_df = pl.concat([self.placements_df, placements_df], rechunk=False)
+                self.placed_item_ids.update(placements_df["itemId"].to_list())
+
+        # The octree's reserve() replays placements rather than marking them, so it can't be rearranged
+        timed_out = bool(not_tried)
+        rearrangement_timed_out = False
+        if unplaced and rearrangement_budget > 0 and self.engine != "octree" and not timed_out:
+            with metrics.span("placement.rearrange"):
+                planner_deadline = time.perf_counter() + rearrangement_budget
+                if deadline is not None:
+                    planner_deadline = min(planner_deadline, deadline)
+                planner = RearrangementPlanner(self, planner_deadline)
+                unplaced = planner.plan(sorted_items_df.filter(pl.col("itemId").is_in(unplaced)))
+                rearrangement_timed_out = planner.timed_out
+                timed_out = planner.timed_out and planner_deadline == deadline
+                if planner.moves or planner.placed:
+                    changed_df = self._placement_frame(
+                        [(item_id, zone, box) for item_id, _, _, zone, box in planner.moves] + planner.placed
+                    )
+                    changed_df = changed_df.unique(subset="itemId", keep="last", maintain_order=True)  # Moved twice
+                    placements_df = replace_placements(placements_df, changed_df)
+                    self.placements_df = replace_placements(self.placements_df, changed_df)
+                    self.placed_item_ids.update(changed_df["itemId"].to_list())
+                    rearrangements_df = self._rearrangement_frame(planner.moves)
+
+        unplaced.extend(not_tried)
+        self.pending_items = [sorted_items_df.filter(pl.col("itemId").is_in(unplaced))] if unplaced else []
+        if timed_out:
+            metrics.count("placement.timed_out")
+
+        with metrics.span("placement.utilization"):
+            utilization_df = self.utilization(self.placements_df)
 
         return pl.DataFrame({
             "success": [True],
             "placements": [placements_df],
-            "rearrangements": [rearrangements_df]
+            "rearrangements": [rearrangements_df],
+            "utilization": [utilization_df],
+            "timedOut": [timed_out],
+            "rearrangementTimedOut": [rearrangement_timed_out],
         })
 
+    @staticmethod
+    def _placement_frame(placements) -> pl.DataFrame:
+        """Placements frame from (itemId, zone, box) tuples."""
+        builder = PlacementBuilder(capacity=len(placements))
+        for item_id, zone, box in placements:
+            builder.append(item_id, zone, box)
+        return builder.build()
+
+    def _rearrangement_frame(self, moves) -> pl.DataFrame:
+        """Rearrangement steps from the planner's moves, in the columns placement responses read."""
+        def container(zone):
+            return str(self.zone_containers[zone]["containerId"]) if zone in self.zone_containers else zone
+
+        rows = []
+        for step, (item_id, from_zone, from_box, to_zone, to_box) in enumerate(moves, start=1):
+            row = {"step": step, "action": "move", "itemId": str(item_id),
+                   "fromContainer": container(from_zone), "toContainer": container(to_zone)}
+            for name, from_value, to_value in zip(COORDINATE_COLUMNS, from_box, to_box):
+                row[f"from_{name}"] = float(from_value)
+                row[f"to_{name}"] = float(to_value)
+            rows.append(row)
+        return pl.DataFrame(rows)
+
+    def _get_pool(self):
+        """Process pool for per-zone packing, created on first use."""
+        if self._pool is None:
+            # Spawn rather than fork: forking a process that runs Polars' thread pool can deadlock
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        """Shut down the placement worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def utilization(self, placements_df: pl.DataFrame) -> pl.DataFrame:
+        """Volume used by placements per zone, relative to the zone's container."""
+        capacity_df = (
+            self.containers_df
+            .with_columns(pl.col("zone").str.strip_chars())
+            .unique(subset="zone", keep="last")  # Placement indexes are keyed by zone, last one wins
+            .select(
+                "zone",
+                (pl.col("width") * pl.col("depth") * pl.col("height")).cast(pl.Float64).alias("capacity")
+            )
+        )
+
+        if placements_df.is_empty():
+            used_df = pl.DataFrame(schema={"zone": pl.Utf8, "usedVolume": pl.Float64})
+        else:
+            used_df = placements_df.group_by("zone").agg(
+                ((pl.col("end_x") - pl.col("start_x"))
+                 * (pl.col("end_y") - pl.col("start_y"))
+                 * (pl.col("end_z") - pl.col("start_z"))).sum().cast(pl.Float64).alias("usedVolume")
+            )
+
+        return (
+            capacity_df.join(used_df, on="zone", how="left")
+            .with_columns(pl.col("usedVolume").fill_null(0.0))
+            .with_columns((pl.col("usedVolume") / pl.col("capacity")).alias("utilization"))
+            .select("zone", "usedVolume", "capacity", "utilization")
+            .sort("zone")
+        )
+
 
 
 
@@ -212,10 +773,35 @@ class CargoClassificationSystem:
 
 
 
+class BatchSearchRequest(BaseModel):
+    itemIds: List[str]
+    userId: Optional[str] = None
+
+
+class RetrieveEvent(BaseModel):
+    itemId: str
+    userId: str = ""
+    timestamp: Optional[str] = None  # ISO format; the time of the request if missing
+
+
+class PlaceEvent(RetrieveEvent):
+    containerId: str
+    position: dict
+
+
+class BatchRetrieveRequest(BaseModel):
+    events: List[RetrieveEvent]
+
+
+class BatchPlaceRequest(BaseModel):
+    events: List[PlaceEvent]
+
+
 class TimeSimulationRequest(BaseModel):
     numOfDays: Optional[int] = None
     toTimestamp: Optional[str] = None
     itemsToBeUsedPerDay: List[Dict[str, str]]
+    perDay: bool = False  # Also report the changes of every simulated day
 
 
 
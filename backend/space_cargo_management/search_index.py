@@ -0,0 +1,168 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+# Appends up to this many items are inserted into the sorted name lists one by one;
+# larger ones re-sort the whole list in Polars
+INSERT_BATCH_LIMIT = 1000
+
+# Fuzzy index blocks kept before they are merged back into one
+MAX_TRIGRAM_BLOCKS = 8
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of a lowercase name, padded so short names still get some."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ItemSearchIndex:
+    """In-memory lookup structures over the item manifest.
+
+    ``rows`` maps every itemId (as a string) to its row in ``items_df``, so
+    id lookups are a single dict access. For names, ``names`` holds every
+    item's lowercase name in sorted order with ``name_ids`` alongside it, so
+    exact and prefix matches are contiguous slices found with bisect.
+
+    Fuzzy search scores distinct names by trigram similarity. Its inverted
+    index maps each trigram to a NumPy array of distinct-name numbers and is
+    only built on the first fuzzy query; names added later go into extra
+    blocks until there are enough of them to merge.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.name_ids: List[str] = []
+        self._reset_fuzzy()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def rebuild(self, items_df: pl.DataFrame):
+        """Indexes the whole manifest from scratch."""
+        self.rows = {}
+        self.names = []
+        self.name_ids = []
+        self._reset_fuzzy()
+        self.extend(items_df, offset=0)
+
+    def extend(self, items_df: pl.DataFrame, offset: int):
+        """Indexes rows appended to the manifest; ``offset`` is the row of the first one."""
+        if items_df.is_empty():
+            return
+
+        ids = items_df["itemId"].cast(pl.Utf8)
+        names = items_df["name"].cast(pl.Utf8).str.to_lowercase()
+        self.rows.update(zip(ids.to_list(), range(offset, offset + len(ids))))
+
+        if self._fuzzy_names is not None:
+            # Names not seen before need trigrams; check before they enter the sorted list
+            new_names = [name for name in names.unique(maintain_order=True).to_list() if not self.find_name(name)]
+
+        if len(ids) <= INSERT_BATCH_LIMIT and self.names:
+            for name, item_id in zip(names.to_list(), ids.to_list()):
+                position = bisect_right(self.names, name)
+                self.names.insert(position, name)
+                self.name_ids.insert(position, item_id)
+        else:
+            sorted_df = pl.DataFrame({
+                "name": pl.concat([pl.Series("name", self.names, dtype=pl.Utf8), names.alias("name")]),
+                "itemId": pl.concat([pl.Series("itemId", self.name_ids, dtype=pl.Utf8), ids.alias("itemId")]),
+            }).sort("name", maintain_order=True)
+            self.names = sorted_df["name"].to_list()
+            self.name_ids = sorted_df["itemId"].to_list()
+
+        if self._fuzzy_names is not None:
+            self._add_trigram_block(new_names)
+
+    def row(self, item_id) -> Optional[int]:
+        """Row of an item in the manifest, or None."""
+        return self.rows.get(str(item_id))
+
+    def find_name(self, name: str) -> List[str]:
+        """ItemIds whose name equals ``name``, ignoring case."""
+        name = name.lower()
+        return self.name_ids[bisect_left(self.names, name):bisect_right(self.names, name)]
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """ItemIds whose name starts with ``prefix`` (ignoring case), in name order."""
+        prefix = prefix.lower()
+        start = bisect_left(self.names, prefix)
+        stop = start
+        while stop < len(self.names) and stop - start < limit and self.names[stop].startswith(prefix):
+            stop += 1
+        return self.name_ids[start:stop]
+
+    def fuzzy(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Top ``limit`` (itemId, score) pairs by trigram similarity of their names to ``query``."""
+        if self._fuzzy_names is None:
+            self._fuzzy_names = []
+            self._add_trigram_block(list(dict.fromkeys(self.names)))  # Distinct names, still sorted
+        if not self._fuzzy_names:
+            return []
+
+        # Count shared trigrams per distinct name in one pass over the postings
+        query_trigrams = trigrams(query.lower())
+        postings = [block[trigram] for block in self._trigram_blocks for trigram in query_trigrams if trigram in block]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._fuzzy_names))
+
+        # Jaccard similarity of the trigram sets
+        candidates = np.flatnonzero(shared)
+        scores = shared[candidates] / (len(query_trigrams) + self._trigram_sizes[candidates] - shared[candidates])
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+
+        result = []
+        for candidate, score in zip(candidates[order], scores[order]):
+            for item_id in self.find_name(self._fuzzy_names[candidate])[:limit - len(result)]:
+                result.append((item_id, round(float(score), 4)))
+            if len(result) >= limit:
+                break
+        return result
+
+    def _reset_fuzzy(self):
+        self._fuzzy_names: Optional[List[str]] = None
+        self._trigram_blocks: List[Dict[str, np.ndarray]] = []
+        self._trigram_sizes = np.zeros(0, dtype=np.int64)
+
+    def _add_trigram_block(self, names: List[str]):
+        """Numbers new distinct names and indexes their trigrams as one block."""
+        if not names:
+            return
+        if len(self._trigram_blocks) >= MAX_TRIGRAM_BLOCKS:
+            names = self._fuzzy_names + names
+            self._reset_fuzzy()
+            self._fuzzy_names = []
+
+        first = len(self._fuzzy_names)
+        self._fuzzy_names.extend(names)
+
+        # Every (name, trigram) pair, built one character offset at a time instead of per name
+        padded = "  " + pl.Series("padded", names, dtype=pl.Utf8) + " "
+        longest = int(padded.str.len_chars().max())
+        pair_trigrams = pl.concat([padded.str.slice(i, 3) for i in range(longest - 2)])
+        pair_names = np.tile(np.arange(len(names), dtype=np.int64), longest - 2)
+        valid = pair_trigrams.str.len_chars() == 3
+        pair_trigrams, pair_names = pair_trigrams.filter(valid), pair_names[valid.to_numpy()]
+
+        # Sort by (trigram, name) as a single integer key and drop repeats within a name
+        keys = pair_trigrams.unique()
+        codes = pair_trigrams.replace_strict(keys, np.arange(len(keys)), return_dtype=pl.Int64).to_numpy()
+        pairs = np.sort(codes * len(names) + pair_names)
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+        codes, numbers = np.divmod(pairs, len(names))
+
+        self._trigram_sizes = np.concatenate([self._trigram_sizes, np.bincount(numbers, minlength=len(names))])
+        bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+        numbers += first
+        self._trigram_blocks.append({
+            trigram: numbers[bounds[i]:bounds[i + 1]]
+            for i, trigram in enumerate(keys.to_list())
+        })
@@ -0,0 +1,149 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import polars as pl
+
+# Day number used for items that never expire or are never used up
+NEVER = np.iinfo(np.int64).max // 4
+
+
+def daily_uses(items_df: pl.DataFrame, usage: List[Dict[str, str]]) -> np.ndarray:
+    """Uses per day of every item under a constant usage plan, in one pass over the manifest.
+
+    Each plan entry uses every item whose itemId or name matches it once a
+    day; empty values match nothing. An item matched by several entries is
+    used once per entry.
+    """
+    if items_df.is_empty() or not usage:
+        return np.zeros(items_df.height, dtype=np.int64)
+
+    entries = pl.DataFrame(
+        {
+            "itemId": [entry.get("itemId") or None for entry in usage],
+            "name": [entry.get("name") or None for entry in usage],
+        },
+        schema={"itemId": pl.Utf8, "name": pl.Utf8},
+    )
+    both = entries.drop_nulls().select(pl.col("itemId") + "\x00" + pl.col("name"))
+
+    def matches(expr: pl.Expr, keys: pl.Series) -> pl.Expr:
+        counts = keys.drop_nulls().value_counts()
+        if counts.is_empty():
+            return pl.lit(0, dtype=pl.Int64)
+        return expr.replace_strict(counts[:, 0], counts[:, 1].cast(pl.Int64), default=0, return_dtype=pl.Int64)
+
+    # Entries matching by id plus entries matching by name, minus those counted twice
+    item_id = pl.col("itemId").cast(pl.Utf8)
+    return items_df.select(
+        matches(item_id, entries["itemId"])
+        + matches(pl.col("name"), entries["name"])
+        - matches(item_id + "\x00" + pl.col("name"), both.to_series())
+    ).to_series().to_numpy()
+
+
+class SimulationEngine:
+    """Advances the mission clock by whole days without stepping through them.
+
+    Usage is the same every day, so each item's future is known in closed
+    form: with ``r`` uses left and ``u`` uses a day it is used up on day
+    ``ceil(r / u)``, unless it expires first (an item is not used on or
+    after its expiry day). The expiry and depletion days of all items form
+    one event queue sorted by day, and the changes of any stretch of days
+    are slices of it found by binary search; days without events cost
+    nothing.
+    """
+
+    def __init__(self, items_df: pl.DataFrame, start: datetime):
+        self.items_df = items_df
+        self.start = start
+        self.item_ids = items_df["itemId"].cast(pl.Utf8).to_list() if not items_df.is_empty() else []
+        self.names = items_df["name"].cast(pl.Utf8).to_list() if not items_df.is_empty() else []
+        self.remaining = np.zeros(len(self.item_ids), dtype=np.int64)
+        self.expiry_day = np.full(len(self.item_ids), NEVER, dtype=np.int64)
+
+        if not items_df.is_empty():
+            used = pl.col("usageCount").fill_null(0) if "usageCount" in items_df.columns else pl.lit(0)
+            self.remaining = items_df.select(
+                (pl.col("usageLimit").fill_null(0) - used).clip(lower_bound=0)
+            ).to_series().to_numpy().astype(np.int64)
+
+            # Day on which the item counts as expired: the first d with expiryDate <= start + d days
+            expiry = pl.col("expiryDate")
+            if items_df["expiryDate"].dtype != pl.Date:
+                expiry = expiry.cast(pl.Utf8).str.to_date("%Y-%m-%d", strict=False)
+            self.expiry_day = items_df.select(
+                (expiry - pl.lit(start.date())).dt.total_days().fill_null(NEVER)
+            ).to_series().to_numpy().astype(np.int64)
+
+    def advance(self, days: int, usage: List[Dict[str, str]], per_day: bool = False) -> dict:
+        """Runs ``days`` days of ``usage``.
+
+        Returns the aggregated changes (the ones the API has always
+        reported), each item's total uses as ``uses`` (aligned with the
+        manifest rows) and, with ``per_day``, the changes of every day.
+        """
+        days = max(0, int(days))
+        per_day_uses = daily_uses(self.items_df, usage)
+
+        # Items already expired at the start are neither used nor reported again
+        active_days = np.clip(self.expiry_day - 1, 0, days)
+        used = (per_day_uses > 0) & (self.remaining > 0)
+        depletion_day = np.full(len(self.remaining), NEVER, dtype=np.int64)
+        depletion_day[used] = -(-self.remaining[used] // per_day_uses[used])  # ceil(r / u)
+        last_use_day = np.where(used, np.minimum(active_days, depletion_day), 0)
+        uses = np.minimum(self.remaining, per_day_uses * last_use_day)
+
+        # Event queue: (day, kind, item) sorted by day; kind 0 = depleted, 1 = expired
+        expired = np.flatnonzero((self.expiry_day >= 1) & (self.expiry_day <= days))
+        depleted = np.flatnonzero(depletion_day <= last_use_day)
+        event_days = np.concatenate([depletion_day[depleted], self.expiry_day[expired]])
+        event_kinds = np.concatenate([np.zeros(len(depleted), dtype=np.int64), np.ones(len(expired), dtype=np.int64)])
+        event_items = np.concatenate([depleted, expired])
+        order = np.lexsort((event_items, event_kinds, event_days))
+        event_days, event_kinds, event_items = event_days[order], event_kinds[order], event_items[order]
+
+        used_items = np.flatnonzero(uses > 0)
+        result = {
+            "changes": {
+                "itemsUsed": [
+                    {"itemId": self.item_ids[i], "name": self.names[i], "remainingUses": int(self.remaining[i] - uses[i]),
+                     "timesUsed": int(uses[i])}
+                    for i in used_items.tolist()
+                ],
+                "itemsExpired": self._events(event_days, event_kinds, event_items, 1),
+                "itemsDepletedToday": self._events(event_days, event_kinds, event_items, 0),
+            },
+            "uses": uses,
+        }
+
+        if per_day:
+            # Items used on day d are those whose last use day is >= d: a suffix in last-use order
+            by_last_use = used_items[np.argsort(last_use_day[used_items], kind="stable")]
+            sorted_last_use = last_use_day[by_last_use]
+            bounds = np.searchsorted(event_days, np.arange(1, days + 2))
+            result["days"] = []
+            for day in range(1, days + 1):
+                today = by_last_use[np.searchsorted(sorted_last_use, day):]
+                begin, end = bounds[day - 1], bounds[day]
+                result["days"].append({
+                    "date": self._date(day).isoformat(),
+                    "itemsUsed": [
+                        {"itemId": self.item_ids[i], "name": self.names[i],
+                         "remainingUses": int(max(0, self.remaining[i] - per_day_uses[i] * day))}
+                        for i in today.tolist()
+                    ],
+                    "itemsExpired": self._events(event_days[begin:end], event_kinds[begin:end], event_items[begin:end], 1),
+                    "itemsDepletedToday": self._events(event_days[begin:end], event_kinds[begin:end], event_items[begin:end], 0),
+                })
+        return result
+
+    def _date(self, day: int) -> date:
+        return self.start.date() + timedelta(days=int(day))
+
+    def _events(self, event_days, event_kinds, event_items, kind: int) -> List[dict]:
+        selected = event_kinds == kind
+        return [
+            {"itemId": self.item_ids[i], "name": self.names[i], "date": self._date(day).isoformat()}
+            for day, i in zip(event_days[selected].tolist(), event_items[selected].tolist())
+        ]
@@ -0,0 +1,97 @@
+import glob
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+from metrics import metrics
+
+# Frames every snapshot holds, one Arrow IPC file each
+SNAPSHOT_FRAMES = ("items", "containers", "placements")
+
+
+class SnapshotStore:
+    """Snapshots of the shared state as Arrow IPC files, one directory per journal version.
+
+    Frames are written uncompressed, so loading can map them instead of
+    decoding them; the small remaining state goes to ``meta.json`` together with
+    the version and the id of the journal it belongs to. A snapshot is
+    written under a temporary name, synced and then renamed into place, so
+    a crash never leaves half a snapshot behind.
+    """
+
+    def __init__(self, root: str, keep: int = 2):
+        self.root = root
+        self.keep = max(2, keep)  # The journal is only compacted up to an older snapshot than the newest
+
+    def write(self, meta: dict, frames: Dict[str, pl.DataFrame]) -> str:
+        """Stores a snapshot of ``meta["version"]``; returns its directory."""
+        directory = self._directory(meta["version"], meta["journalId"])
+        if os.path.isdir(directory):
+            return directory  # Another process got there first
+
+        os.makedirs(self.root, exist_ok=True)
+        temporary = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        os.makedirs(temporary)
+        try:
+            for name in SNAPSHOT_FRAMES:
+                with open(os.path.join(temporary, f"{name}.arrow"), "wb") as file:
+                    frames[name].write_ipc(file, compression="uncompressed")
+                    file.flush()
+                    os.fsync(file.fileno())
+            with open(os.path.join(temporary, "meta.json"), "w") as file:
+                json.dump(meta, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, directory)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+        metrics.count("state.snapshots_written")
+        return directory
+
+    def latest(self, journal_id: str) -> Optional[Tuple[dict, Dict[str, pl.DataFrame]]]:
+        """Meta and frames of the newest snapshot of ``journal_id``, or None."""
+        for meta, directory in self._snapshots():
+            if meta.get("journalId") == journal_id:
+                frames = {
+                    name: pl.read_ipc(os.path.join(directory, f"{name}.arrow"))
+                    for name in SNAPSHOT_FRAMES
+                }
+                return meta, frames
+        return None
+
+    def prune(self, journal_id: str) -> Optional[int]:
+        """Keeps the newest ``keep`` snapshots of ``journal_id`` and removes the rest.
+
+        Snapshots of other journals (e.g. of a deleted state database) go as
+        well. Returns the version of the oldest snapshot kept, the point up
+        to which the journal may be compacted, or None while only one is
+        kept, so the journal is never compacted up to the newest snapshot.
+        """
+        kept = []
+        for meta, directory in self._snapshots():
+            if meta.get("journalId") == journal_id and len(kept) < self.keep:
+                kept.append(meta["version"])
+            else:
+                shutil.rmtree(directory, ignore_errors=True)  # Loaded frames stay mapped where the OS allows it
+        return kept[-1] if len(kept) > 1 else None
+
+    def _snapshots(self) -> List[Tuple[dict, str]]:
+        """(meta, directory) of every complete snapshot, newest first."""
+        snapshots = []
+        for directory in glob.glob(os.path.join(self.root, "v*")):
+            try:
+                with open(os.path.join(directory, "meta.json")) as file:
+                    snapshots.append((json.load(file), directory))
+            except (OSError, ValueError):
+                continue
+        snapshots.sort(key=lambda snapshot: snapshot[0].get("version", 0), reverse=True)
+        return snapshots
+
+    def _directory(self, version: int, journal_id: str) -> str:
+        return os.path.join(self.root, f"v{version:012d}-{journal_id}")
@@ -0,0 +1,339 @@
+import io
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+import polars as pl
+
+import config
+from metrics import metrics
+from schemas import CargoPlacementSystem, optimize_snapshot
+from snapshot_store import SnapshotStore
+
+
+class SharedState:
+    """Application state shared by every router and every worker process.
+
+    Each process keeps the state in memory and a SQLite database in WAL mode
+    holds the journal of every change, in order. Reads first replay the
+    journal entries the process has not seen yet, which is a cheap indexed
+    query when nothing changed and never blocks other readers. Writes run
+    inside ``BEGIN IMMEDIATE``, so only one process changes the state at a
+    time; the writer catches up first, changes its in-memory state and
+    appends the change to the journal in the same transaction.
+
+    Changes are journaled as operations (see ``OPERATIONS``) with JSON
+    arguments and an optional DataFrame payload stored as Arrow IPC.
+    Placement runs are journaled with their result, so other processes
+    adopt the placements instead of packing again.
+
+    Every ``snapshot_every`` entries the state is also written out as an
+    Arrow IPC snapshot (see SnapshotStore) and journal entries older than
+    the oldest snapshot kept are deleted. A process starting up, or one so
+    far behind that its next entries are gone, loads the newest snapshot and
+    replays only the journal after it.
+    """
+
+    def __init__(self, path: str = config.STATE_DB, snapshot_dir: str = config.SNAPSHOT_DIR,
+                 snapshot_every: int = config.SNAPSHOT_EVERY, snapshot_keep: int = config.SNAPSHOT_KEEP):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, args TEXT NOT NULL, "
+            "payload BLOB, created TEXT NOT NULL)"
+        )
+        # Identifies this journal, so snapshots of a deleted database are never loaded into a new one
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('journal_id', ?)", (uuid.uuid4().hex,))
+        self.journal_id = self._connection.execute("SELECT value FROM meta WHERE key = 'journal_id'").fetchone()[0]
+
+        self.snapshots = SnapshotStore(snapshot_dir, snapshot_keep)
+        self.snapshot_every = snapshot_every
+        self.snapshot_version = 0  # Version of the last snapshot this process loaded or took
+        self._snapshot_thread = None
+        self._in_write = False
+        self._dirty = False
+        self._restore()
+
+    def _reset_local(self):
+        """Fresh in-memory state that has seen no journal entry."""
+        self.system = CargoPlacementSystem(engine=config.PLACEMENT_ENGINE, workers=config.PLACEMENT_WORKERS)
+        self.current_date = datetime.now(timezone.utc)  # Simulated mission date
+        self.return_plans = []
+        self.completed_undocking = {}
+        self.version = 0  # Last journal entry applied
+
+    def _restore(self):
+        """Fresh in-memory state from the newest snapshot of this journal, or empty without one."""
+        self._reset_local()
+        snapshot = self.snapshots.latest(self.journal_id)
+        if snapshot is None:
+            return
+        meta, frames = snapshot
+        with metrics.span("state.restore"):
+            system = self.system
+            if not frames["containers"].is_empty():
+                system.add_containers(frames["containers"].to_dicts())
+            if not frames["items"].is_empty():
+                system.add_items(frames["items"])
+            # Zone indexes are rebuilt from the placements only when the next incremental run needs them
+            system.apply_placements(frames["placements"], reset=True)
+            self.current_date = datetime.fromisoformat(meta["currentDate"])
+            self.return_plans = meta["returnPlans"]
+            self.completed_undocking = meta["completedUndocking"]
+            self.version = self.snapshot_version = meta["version"]
+
+    @property
+    def waste_items_df(self) -> pl.DataFrame:
+        """Items that are waste on the simulated date, from the waste index."""
+        return self.system.waste_items(self.current_date.date())
+
+    def read(self) -> "SharedState":
+        """Brings the state up to date with other processes and returns it."""
+        with self._lock:
+            if not self._in_write:
+                self._catch_up()
+        return self
+
+    @contextmanager
+    def write(self):
+        """Serializes a change across processes; yields the up-to-date state.
+
+        Use ``apply`` and ``record`` inside the block. If the block fails
+        after changing the state, the change is rolled back and the
+        in-memory state is rebuilt from the journal.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")  # Waits for other writers
+            self._in_write = True
+            self._dirty = False
+            try:
+                self._catch_up()
+                yield self
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                if self._dirty:
+                    self.system.close()
+                    self._restore()
+                    self._catch_up()
+                raise
+            else:
+                self._connection.execute("COMMIT")
+            finally:
+                self._in_write = False
+            if self.snapshot_every > 0 and self.version - self.snapshot_version >= self.snapshot_every:
+                self.snapshot(wait=False)
+
+    def apply(self, op: str, args: Optional[dict] = None, frame: Optional[pl.DataFrame] = None):
+        """Runs an operation on this process's state and journals it."""
+        args = args or {}
+        self._dirty = True
+        result = OPERATIONS[op](self, args, frame)
+        self.record(op, args, frame)
+        return result
+
+    def record(self, op: str, args: Optional[dict] = None, frame: Optional[pl.DataFrame] = None):
+        """Journals an operation whose effect this process already has."""
+        if not self._in_write:
+            raise RuntimeError("SharedState.record must be called inside write()")
+        self._dirty = True
+        payload = None
+        if frame is not None:
+            buffer = io.BytesIO()
+            frame.write_ipc(buffer, compression="lz4")
+            payload = buffer.getvalue()
+        cursor = self._connection.execute(
+            "INSERT INTO journal (op, args, payload, created) VALUES (?, ?, ?, ?)",
+            (op, json.dumps(args), payload, datetime.now(timezone.utc).isoformat()),
+        )
+        self.version = cursor.lastrowid
+
+    def optimize(self, incremental: bool, rearrangement_budget: float = 0.0, run=None, attempts: int = 3,
+                 deadline: Optional[float] = None):
+        """Packs a snapshot of the state outside the lock and commits the result.
+
+        The lock is held only to take the snapshot and to commit, so reads
+        and short writes go on while packing. If the state changed in
+        between, the packed snapshot is dropped and the new state is packed,
+        up to ``attempts`` times, within what is left until ``deadline`` (a
+        ``time.perf_counter()`` value).
+        ``run(function, *args)`` executes the packing, e.g. on a job's
+        worker; by default it runs right here.
+
+        Returns the placement result, the version right after the commit
+        and the version the packed snapshot was taken at.
+        """
+        run = run or (lambda function, *args: function(*args, None))
+        for _ in range(attempts):
+            with self._lock:
+                if not self._in_write:
+                    self._catch_up()
+                version = self.version
+                snapshot = self.system.snapshot(indexes=incremental)
+
+            left = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            packed, result_columns = run(optimize_snapshot, snapshot, incremental, rearrangement_budget, left)
+            result = pl.DataFrame(result_columns)
+
+            with self.write():
+                if self.version != version:
+                    continue  # Packed from an outdated state
+                if result["success"][0]:
+                    self.system.adopt_placements(packed)
+                    # Other processes adopt the placements instead of packing again
+                    if not incremental or not result["placements"][0].is_empty():
+                        self.record("placements", {"reset": not incremental}, result["placements"][0])
+                return result, self.version, version
+        raise RuntimeError("The state kept changing while packing; try again.")
+
+    def snapshot(self, wait: bool = True):
+        """Writes this process's state out as a snapshot, unless it has one of this version already.
+
+        The frames are taken under the lock, which is cheap since they are
+        immutable; writing them and compacting the journal happen on a
+        background thread. ``wait`` blocks until that is done.
+        """
+        with self._lock:
+            thread = self._snapshot_thread
+            if thread is not None and thread.is_alive():
+                if not wait:
+                    return  # The next write tries again
+                thread.join()
+            if not self._in_write:
+                self._catch_up()
+            if self.version == self.snapshot_version:
+                return
+            meta = {
+                "version": self.version,
+                "journalId": self.journal_id,
+                "created": datetime.now(timezone.utc).isoformat(),
+                "currentDate": self.current_date.isoformat(),
+                "returnPlans": list(self.return_plans),
+                "completedUndocking": dict(self.completed_undocking),
+            }
+            frames = {
+                "items": self.system.items_df,
+                "containers": self.system.containers_df,
+                "placements": self.system.placements_df,
+            }
+            self.snapshot_version = self.version
+            thread = self._snapshot_thread = threading.Thread(
+                target=self._write_snapshot, args=(meta, frames), name="state-snapshot", daemon=True
+            )
+            thread.start()
+        if wait:
+            thread.join()
+
+    def _write_snapshot(self, meta: dict, frames: dict):
+        with metrics.span("state.snapshot"):
+            self.snapshots.write(meta, frames)
+            oldest = self.snapshots.prune(self.journal_id)
+        if oldest is None:
+            return
+        # Entries the oldest snapshot kept already covers; own connection, as this runs off the lock
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            with connection:
+                deleted = connection.execute("DELETE FROM journal WHERE seq <= ?", (oldest,)).rowcount
+        finally:
+            connection.close()
+        metrics.count("state.journal_compacted", deleted)
+
+    def close(self):
+        """Snapshots the state (so the next start is warm) and closes the journal."""
+        if self.snapshot_every > 0:
+            self.snapshot(wait=True)
+        self.system.close()
+        self._connection.close()
+
+    def _catch_up(self):
+        rows = self._connection.execute(
+            "SELECT seq, op, args, payload FROM journal WHERE seq > ? ORDER BY seq", (self.version,)
+        ).fetchall()
+        if rows:
+            first = rows[0][0]
+        else:
+            # Nothing left to replay can also mean it was all compacted away; the sequence remembers
+            last = self._connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'journal'").fetchone()
+            first = (last[0] if last else 0) + 1
+        if first > self.version + 1:
+            # The entries in between were compacted away: start over from the newest snapshot
+            self.system.close()
+            self._restore()
+            if self.version < first - 1:
+                raise RuntimeError(f"Journal entries {self.version + 1} to {first - 1} are missing.")
+            rows = [row for row in rows if row[0] > self.version]
+        for seq, op, args, payload in rows:
+            frame = pl.read_ipc(io.BytesIO(payload)) if payload is not None else None
+            OPERATIONS[op](self, json.loads(args), frame)
+            self.version = seq
+
+
+# ---------------- Journaled operations ----------------
+# Each takes (state, args, frame) and must give the same result in every process.
+
+def _add_items(state, args, frame):
+    state.system.add_items(frame, append=args.get("append", False))
+
+
+def _add_containers(state, args, frame):
+    state.system.add_containers(frame.to_dicts())
+
+
+def _placements(state, args, frame):
+    state.system.apply_placements(frame, reset=args.get("reset", False))
+
+
+def _use_item(state, args, frame):
+    state.system.use_item(args["itemId"])
+
+
+def _add_usage(state, args, frame):
+    state.system.add_usage(frame)
+
+
+def _move_item(state, args, frame):
+    state.system.move_item(args["itemId"], args["containerId"], args["position"])
+
+
+def _move_items(state, args, frame):
+    state.system.move_items(frame)
+
+
+def _set_date(state, args, frame):
+    state.current_date = datetime.fromisoformat(args["date"])
+
+
+def _add_return_plan(state, args, frame):
+    state.return_plans.append(args["manifest"])
+
+
+def _complete_undocking(state, args, frame):
+    state.completed_undocking[args["containerId"]] = args["record"]
+
+
+OPERATIONS = {
+    "add_items": _add_items,
+    "add_containers": _add_containers,
+    "placements": _placements,
+    "use_item": _use_item,
+    "add_usage": _add_usage,
+    "move_item": _move_item,
+    "move_items": _move_items,
+    "set_date": _set_date,
+    "add_return_plan": _add_return_plan,
+    "complete_undocking": _complete_undocking,
+}
+
+
+# Shared by all routers of this process
+shared_state = SharedState()
@@ -0,0 +1,171 @@
+import math
+import numpy as np
+
+
+def _window_any(cells, length, axis):
+    """For each start along ``axis``, whether any of the ``length`` cells from there is set.
+
+    Windows are doubled by OR-ing shifted copies, so a window of n cells
+    costs about log2(n) passes over the array.
+    """
+    span = 1
+    while span < length:
+        step = min(span, length - span)
+        head = [slice(None)] * cells.ndim
+        tail = [slice(None)] * cells.ndim
+        head[axis], tail[axis] = slice(0, -step), slice(step, None)
+        cells = cells[tuple(head)] | cells[tuple(tail)]
+        span += step
+    return cells
+
+
+class VoxelGrid:
+    """Dense occupancy grid for one container.
+
+    The container is split into cubic cells of side ``resolution``. ``occupied``
+    holds 1 for every used cell, indexed (x, y, z) but stored layer by layer,
+    and ``layer_used`` counts the used cells per z layer. Placing only marks
+    cells; a lookup tests the few layers it needs with sliding-window ORs,
+    so nothing is kept up to date over the whole grid.
+
+    Cells are never freed, so a box has no free origin below the layer an
+    earlier lookup of a box no bigger on any axis started at. Every lookup
+    is kept as such a floor (``nz`` if it found nothing) to skip those layers.
+    """
+
+    def __init__(self, container_row, resolution=None, max_cells=2_000_000):
+        self.width = float(container_row["width"])
+        self.depth = float(container_row["depth"])
+        self.height = float(container_row["height"])
+
+        if resolution is None:
+            # Unit cells unless the container would need more than max_cells of them
+            volume = self.width * self.depth * self.height
+            resolution = max(1.0, (volume / max_cells) ** (1 / 3))
+        self.resolution = float(resolution)
+
+        self.shape = (
+            int(self.width // self.resolution),
+            int(self.depth // self.resolution),
+            int(self.height // self.resolution),
+        )
+        # (z, y, x) in memory, so a run of layers is one contiguous block
+        self.layers = np.zeros(self.shape[::-1], dtype=bool)
+        self.occupied = self.layers.transpose(2, 1, 0)
+        self.layer_used = np.zeros(self.shape[2], dtype=np.int64)
+        self.floor_boxes = np.zeros((64, 3), dtype=np.int64)
+        self.floor_layers = np.zeros(64, dtype=np.int64)
+        self.floor_count = 0
+
+    def _cells(self, length):
+        """Number of cells needed to cover ``length`` (tolerates float noise)."""
+        return max(1, math.ceil(length / self.resolution - 1e-9))
+
+    def box_sum(self, x, y, z, w, d, h):
+        """Count occupied cells in the box starting at cell (x, y, z) of w×d×h cells."""
+        return int(np.count_nonzero(self.occupied[x:x + w, y:y + d, z:z + h]))
+
+    def is_free(self, x, y, z, w, d, h):
+        """True if the w×d×h cell box at (x, y, z) lies inside the grid and is empty."""
+        nx, ny, nz = self.shape
+        if x < 0 or y < 0 or z < 0 or x + w > nx or y + d > ny or z + h > nz:
+            return False
+        return not self.occupied[x:x + w, y:y + d, z:z + h].any()
+
+    def free_origins(self, w, d, h, z_start=0, z_stop=None):
+        """Boolean array over origin cells (z layers z_start..z_stop) where a w×d×h box is empty."""
+        nx, ny, nz = self.shape
+        if w > nx or d > ny or h > nz:
+            return np.zeros((0, 0, 0), dtype=bool)
+
+        z_stop = nz - h + 1 if z_stop is None else min(z_stop, nz - h + 1)
+        if z_stop <= z_start:
+            return np.zeros((nx - w + 1, ny - d + 1, 0), dtype=bool)
+        return ~self._blocked(w, d, h, z_start, z_stop).transpose(2, 1, 0)
+
+    def _blocked(self, w, d, h, z_start, z_stop):
+        """(z, y, x) array of origins whose w×d×h box holds a used cell."""
+        blocked = _window_any(self.layers[z_start:z_stop + h - 1], h, 0)
+        blocked = _window_any(blocked, d, 1)
+        return _window_any(blocked, w, 2)
+
+    def find_position(self, w, d, h, slab=16):
+        """Returns the lowest, back-most, left-most free origin cell for a w×d×h box, or None.
+
+        Only origin layers with room for the footprint in each of the h
+        layers above are tried, in slabs that start at one layer and double
+        up to ``slab``, so the usual low hit costs a few layers.
+        """
+        nx, ny, nz = self.shape
+        if w > nx or d > ny or h > nz:
+            return None
+        if self.layer_used.sum() + w * d * h > nx * ny * nz:
+            return None  # Not enough free cells left anywhere
+
+        lowest = self._floor(w, d, h)
+        roomy = np.concatenate(([0], np.cumsum(self.layer_used <= nx * ny - w * d)))
+        candidates = np.flatnonzero(roomy[h:] - roomy[:-h] == h)
+        candidates = candidates[candidates >= lowest]
+
+        index, size = 0, 1
+        while index < len(candidates):
+            z_start = int(candidates[index])
+            z_stop = min(z_start + size, nz - h + 1)
+            # Memory order is (z, y, x), so the first free origin is the lowest, then back-most
+            free = ~self._blocked(w, d, h, z_start, z_stop)
+            flat_index = int(np.argmax(free))
+            if free.flat[flat_index]:
+                z, y, x = np.unravel_index(flat_index, free.shape)
+                self._add_floor(w, d, h, int(z) + z_start)
+                return int(x), int(y), int(z) + z_start
+            index = int(np.searchsorted(candidates, z_stop))
+            size = min(size * 2, slab)
+        self._add_floor(w, d, h, nz)
+        return None
+
+    def _floor(self, w, d, h):
+        """Lowest layer a w×d×h box may still have a free origin in."""
+        boxes = self.floor_boxes[:self.floor_count]
+        smaller = (boxes[:, 0] <= w) & (boxes[:, 1] <= d) & (boxes[:, 2] <= h)
+        return int(self.floor_layers[:self.floor_count][smaller].max(initial=0))
+
+    def _add_floor(self, w, d, h, layer):
+        if self.floor_count == len(self.floor_layers):
+            self.floor_boxes = np.concatenate((self.floor_boxes, np.zeros_like(self.floor_boxes)))
+            self.floor_layers = np.concatenate((self.floor_layers, np.zeros_like(self.floor_layers)))
+        self.floor_boxes[self.floor_count] = (w, d, h)
+        self.floor_layers[self.floor_count] = layer
+        self.floor_count += 1
+
+    def occupy(self, x, y, z, w, d, h):
+        """Marks a cell box as used."""
+        box = self.layers[z:z + h, y:y + d, x:x + w]
+        self.layer_used[z:z + h] += box.size // h - np.count_nonzero(box, axis=(1, 2))
+        box[...] = True
+
+    def reserve(self, position):
+        """Marks an already decided placement (start_x, ..., end_z) as used."""
+        x, y, z = (int(round(position[axis] / self.resolution)) for axis in range(3))
+        w, d, h = (self._cells(position[axis + 3] - position[axis]) for axis in range(3))
+        self.occupy(x, y, z, w, d, h)
+
+    def place_item(self, item_row):
+        """Finds the first free position for an item and reserves it."""
+        w = self._cells(item_row["width"])
+        d = self._cells(item_row["depth"])
+        h = self._cells(item_row["height"])
+
+        position = self.find_position(w, d, h)
+        if position is None:
+            return None  # No space found
+
+        x, y, z = position
+        self.occupy(x, y, z, w, d, h)
+
+        start_x, start_y, start_z = x * self.resolution, y * self.resolution, z * self.resolution
+        return (
+            start_x, start_y, start_z,
+            start_x + item_row["width"],
+            start_y + item_row["depth"],
+            start_z + item_row["height"]
+        )  # Same coordinates as Octree.place_item
@@ -0,0 +1,94 @@
+from datetime import date
+from typing import Iterable, List
+
+import numpy as np
+import polars as pl
+
+EPOCH = date(1970, 1, 1)
+
+
+def _day(value: date) -> int:
+    """Days since 1970-01-01, the physical value of a Polars Date."""
+    return (value - EPOCH).days
+
+
+def _expiry_days(items_df: pl.DataFrame) -> pl.Series:
+    """Expiry dates as days since the epoch; null where there is none or it doesn't parse."""
+    expiry = items_df["expiryDate"] if "expiryDate" in items_df.columns else pl.Series([None] * items_df.height, dtype=pl.Date)
+    if expiry.dtype != pl.Date:
+        expiry = expiry.cast(pl.Utf8).str.to_date("%Y-%m-%d", strict=False)
+    return expiry.cast(pl.Int32)
+
+
+class WasteIndex:
+    """Manifest rows that are waste, or will be, without scanning the manifest.
+
+    Expiry: rows with an expiry date are kept in two parallel arrays sorted
+    by that date, so the rows expired on a given day are a prefix of them
+    and the rows expiring in a date range are a slice, both found by binary
+    search. Depletion: ``depleted`` holds the rows whose usage count has
+    reached their usage limit; it is only updated for the rows whose count
+    changes.
+    """
+
+    def __init__(self):
+        self._expiry = np.zeros(0, dtype=np.int32)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self.depleted = set()
+
+    def rebuild(self, items_df: pl.DataFrame):
+        """Indexes the whole manifest from scratch."""
+        self._expiry = np.zeros(0, dtype=np.int32)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self.depleted = set()
+        self.extend(items_df, offset=0)
+
+    def extend(self, items_df: pl.DataFrame, offset: int):
+        """Indexes rows appended to the manifest; ``offset`` is the row of the first one."""
+        if items_df.is_empty():
+            return
+
+        expiry = _expiry_days(items_df)
+        has_expiry = expiry.is_not_null().to_numpy()
+        if has_expiry.any():
+            new_expiry = expiry.to_numpy()[has_expiry].astype(np.int32)
+            new_rows = np.flatnonzero(has_expiry) + offset
+            order = np.argsort(new_expiry, kind="stable")
+            new_expiry, new_rows = new_expiry[order], new_rows[order]
+
+            # Merge into the sorted arrays; later rows go after equal dates
+            positions = np.searchsorted(self._expiry, new_expiry, side="right")
+            self._expiry = np.insert(self._expiry, positions, new_expiry)
+            self._rows = np.insert(self._rows, positions, new_rows)
+
+        if "usageCount" in items_df.columns:
+            self.update_usage(range(offset, offset + items_df.height), items_df["usageCount"], items_df["usageLimit"])
+
+    def update_usage(self, rows: Iterable[int], usage_counts: pl.Series, usage_limits: pl.Series):
+        """Re-checks the given rows after their usage counts changed.
+
+        An item is depleted once it has been used and its count reached its limit.
+        """
+        for row, count, limit in zip(rows, usage_counts.fill_null(0).to_list(), usage_limits.fill_null(0).to_list()):
+            if count > 0 and count >= limit:
+                self.depleted.add(row)
+            else:
+                self.depleted.discard(row)
+
+    def expired(self, on: date) -> np.ndarray:
+        """Rows whose expiry date is on or before ``on``, earliest first."""
+        return self._rows[:np.searchsorted(self._expiry, _day(on), side="right")]
+
+    def expiring(self, after: date, before: date) -> np.ndarray:
+        """Rows expiring after ``after`` and before ``before``, earliest first."""
+        begin = np.searchsorted(self._expiry, _day(after), side="right")
+        end = np.searchsorted(self._expiry, _day(before), side="left")
+        return self._rows[begin:max(begin, end)]
+
+    def waste(self, on: date) -> List[tuple]:
+        """(row, reason) of every waste item on ``on``; expiry wins over depletion."""
+        expired = self.expired(on).tolist()
+        expired_rows = set(expired)
+        return [(row, "Expired") for row in expired] + [
+            (row, "Out of Uses") for row in sorted(self.depleted) if row not in expired_rows
+        ]